@@ -0,0 +1,55 @@
+"""Store users.role as a SMALLINT rank instead of the userrole ENUM
+
+Databases created before this change hold users.role as the Postgres ENUM
+userrole with the member names ('USER', 'ADMIN', 'SUPER_ADMIN'); RoleRank now
+reads and writes the rank (0, 1, 2). Tables created by create_all after the
+change already have the SMALLINT column, so the conversion only runs while the
+column is still the ENUM.
+
+Revision ID: 0001_role_rank
+Revises:
+Create Date: 2026-10-15
+
+"""
+from typing import Optional, Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001_role_rank'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _role_column_type() -> Optional[str]:
+    """information_schema data_type of users.role, None if the table does not exist yet."""
+    return op.get_bind().execute(sa.text(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = 'users' AND column_name = 'role'"
+    )).scalar()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ENUM columns report USER-DEFINED; offline (--sql) output cannot inspect, so it always converts
+    if not context.is_offline_mode() and _role_column_type() != "USER-DEFINED":
+        return
+    op.execute(
+        "ALTER TABLE users ALTER COLUMN role TYPE smallint USING CASE role::text "
+        "WHEN 'USER' THEN 0 WHEN 'ADMIN' THEN 1 WHEN 'SUPER_ADMIN' THEN 2 END"
+    )
+    op.execute("DROP TYPE IF EXISTS userrole")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not context.is_offline_mode() and _role_column_type() != "smallint":
+        return
+    op.execute("CREATE TYPE userrole AS ENUM ('USER', 'ADMIN', 'SUPER_ADMIN')")
+    op.execute(
+        "ALTER TABLE users ALTER COLUMN role TYPE userrole USING (CASE role "
+        "WHEN 0 THEN 'USER' WHEN 1 THEN 'ADMIN' WHEN 2 THEN 'SUPER_ADMIN' END)::userrole"
+    )
@@ -0,0 +1,75 @@
+"""Add costumes.search_tsv and the search/list indexes
+
+Brings databases created before these model changes up to date; create_all
+only builds them for new tables:
+
+- costumes.search_tsv, the stored generated tsvector behind costume search,
+  and its GIN index ix_costumes_search_tsv
+- ix_costumes_tags (GIN) for the tags @> filter
+- ix_costumes_created_id and ix_costumes_active_created_id for keyset
+  pagination of the admin and public lists
+- ix_users_search_trgm (GIN, pg_trgm) for user search
+
+Every statement is IF NOT EXISTS, so databases that already have them are
+left alone. Plain CREATE INDEX (not CONCURRENTLY), since revisions run in a
+transaction; it blocks writes to the table while the index builds.
+
+Revision ID: 0002_search_and_list_indexes
+Revises: 0001_role_rank
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002_search_and_list_indexes'
+down_revision: Union[str, Sequence[str], None] = '0001_role_rank'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(name: str) -> bool:
+    """Whether a table exists; offline (--sql) output cannot inspect, so it assumes it does."""
+    if context.is_offline_mode():
+        return True
+    return op.get_bind().execute(sa.text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if _has_table("costumes"):
+        op.execute(
+            "ALTER TABLE costumes ADD COLUMN IF NOT EXISTS search_tsv tsvector GENERATED ALWAYS AS "
+            "(to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, '') "
+            "|| ' ' || coalesce(items, ''))) STORED"
+        )
+        op.execute("CREATE INDEX IF NOT EXISTS ix_costumes_search_tsv ON costumes USING gin (search_tsv)")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_costumes_tags ON costumes USING gin (tags)")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_costumes_created_id ON costumes (created_at, id)")
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_costumes_active_created_id ON costumes (is_active, created_at, id) "
+            "INCLUDE (name, price, gender, age_category, tags)"
+        )
+
+    if _has_table("users"):
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_users_search_trgm ON users USING gin "
+            "((email || ' ' || username || ' ' || coalesce(full_name, '')) gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # pg_trgm is left installed; other objects may use it
+    op.execute("DROP INDEX IF EXISTS ix_users_search_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_costumes_active_created_id")
+    op.execute("DROP INDEX IF EXISTS ix_costumes_created_id")
+    op.execute("DROP INDEX IF EXISTS ix_costumes_tags")
+    op.execute("DROP INDEX IF EXISTS ix_costumes_search_tsv")
+    if _has_table("costumes"):
+        op.execute("ALTER TABLE costumes DROP COLUMN IF EXISTS search_tsv")
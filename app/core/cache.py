@@ -0,0 +1,62 @@
+from typing import Optional
+import time
+from cachetools import TLRUCache, TTLCache
+from app.core.config import settings
+from app.core.security import token_digest
+
+def _body_size(entry) -> int:
+    return len(entry[0])
+
+
+# Public costume listings as rendered (body, headers) keyed by their normalized query
+# parameters; bounded by total body bytes, since anyone can pick the parameters
+costume_list_cache = TTLCache(
+    maxsize=settings.COSTUME_LIST_CACHE_BYTES, ttl=settings.COSTUME_CACHE_TTL, getsizeof=_body_size
+)
+
+# Public costume details as rendered (body, headers) keyed by costume id
+costume_detail_cache = TTLCache(maxsize=4096, ttl=settings.COSTUME_CACHE_TTL)
+
+def _user_ctx_ttu(_key: bytes, ctx, now: float) -> float:
+    # Never outlive the token itself
+    return min(now + settings.AUTH_CACHE_TTL, ctx.exp)
+
+
+# Authenticated user identities (CurrentUserCtx) keyed by token_digest() of the bearer token,
+# each kept until the earlier of the token's exp claim or AUTH_CACHE_TTL
+user_ctx_cache = TLRUCache(maxsize=10_000, ttu=_user_ctx_ttu, timer=time.time)
+
+
+def cache_costume_list(key, entry) -> None:
+    """Remember a rendered listing unless its body alone exceeds the cache's byte budget."""
+    if _body_size(entry) <= costume_list_cache.maxsize:
+        costume_list_cache[key] = entry
+
+
+def invalidate_costumes(costume_id: Optional[int] = None) -> None:
+    """Drop cached public costume data after a write; details only for costume_id if given."""
+    costume_list_cache.clear()
+    if costume_id is None:
+        costume_detail_cache.clear()
+    else:
+        costume_detail_cache.pop(costume_id, None)
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drop cached identities of a user after their role, status or account changes."""
+    for key, ctx in list(user_ctx_cache.items()):
+        if ctx.id == user_id:
+            user_ctx_cache.pop(key, None)
+
+
+def invalidate_users(user_ids) -> None:
+    """Drop cached identities of several users in one pass over the cache."""
+    user_ids = set(user_ids)
+    for key, ctx in list(user_ctx_cache.items()):
+        if ctx.id in user_ids:
+            user_ctx_cache.pop(key, None)
+
+
+def invalidate_token(token: str) -> None:
+    """Drop the cached identity for a single bearer token."""
+    user_ctx_cache.pop(token_digest(token), None)
@@ -5,6 +5,11 @@ import secrets
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 10  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds
+    DB_USE_PGBOUNCER: bool = False  # PgBouncer (transaction mode) pools instead of SQLAlchemy
     
     # JWT
     SECRET_KEY: str
@@ -14,6 +19,9 @@ class Settings(BaseSettings):
     
     # Security
     BCRYPT_ROUNDS: int = 12
+    ARGON2_MEMORY_COST: int = 19456  # KiB
+    ARGON2_TIME_COST: int = 2
+    ARGON2_PARALLELISM: int = 1
     
     # Admin
     ADMIN_EMAIL: str = "admin@bericosplay.com"
@@ -27,6 +35,20 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     BACKEND_CORS_ORIGINS: List[str] = ["*"]
     
+    # Images
+    AVIF_SPEED: int = 8  # 0 (slowest, smallest) .. 10 (fastest)
+    IMAGE_ENCODER_THREADS: int = 2  # threads per encode; variants already run in parallel
+    
+    # Cache
+    COSTUME_CACHE_TTL: int = 30  # seconds
+    COSTUME_LIST_CACHE_BYTES: int = 32 * 1024 * 1024  # total rendered list bodies kept
+    AUTH_CACHE_TTL: int = 30  # seconds
+    PUBLIC_CACHE_MAX_AGE: int = 60  # seconds browsers/CDNs may reuse public costume GETs
+    PUBLIC_CACHE_STALE: int = 300  # seconds they may serve stale while revalidating
+    
+    # Startup
+    RUN_MIGRATIONS: bool = True  # set false on all but one worker / init container
+    
     # Debug
     DEBUG: bool = True
     
@@ -1,17 +1,231 @@
 import asyncio
 from pathlib import Path
-from io import BytesIO
 from PIL import Image
 import aiofiles
 from fastapi import UploadFile
 import logging
 from typing import List, Tuple, Optional
 from dataclasses import dataclass
+import functools
 import hashlib
+import itertools
+import json
 import os
+import shutil
+import tempfile
+import weakref
+from concurrent.futures import Executor
+from app.core.config import settings
+
+# Cap libvips' per-operation worker threads (must be set before import); uploads already encode in parallel
+os.environ.setdefault("VIPS_CONCURRENCY", str(settings.IMAGE_ENCODER_THREADS))
+
+try:
+    import pyvips
+except (ImportError, OSError):  # libvips not installed, fall back to PIL
+    pyvips = None
 
 logger = logging.getLogger(__name__)
 
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOADS_URL = "/uploads"
+MANIFEST_NAME = "manifest.json"
+
+
+# Image variants to generate, in URL preference order within each size; plain dicts
+# so they pickle into the encode process pool
+IMAGE_VARIANTS = (
+    # Thumbnail
+    {"format": "webp", "width": 200, "height": 200, "quality": 80, "suffix": "_thumb"},
+    {"format": "avif", "width": 200, "height": 200, "quality": 80, "suffix": "_thumb"},
+    {"format": "jpg", "width": 200, "height": 200, "quality": 80, "suffix": "_thumb"},
+    # Medium
+    {"format": "webp", "width": 800, "height": 800, "quality": 85, "suffix": "_medium"},
+    {"format": "avif", "width": 800, "height": 800, "quality": 85, "suffix": "_medium"},
+    {"format": "jpg", "width": 800, "height": 800, "quality": 85, "suffix": "_medium"},
+    # Large
+    {"format": "webp", "width": 1920, "height": 1920, "quality": 90, "suffix": "_large"},
+    {"format": "avif", "width": 1920, "height": 1920, "quality": 90, "suffix": "_large"},
+    {"format": "jpg", "width": 1920, "height": 1920, "quality": 90, "suffix": "_large"},
+)
+
+
+# Accepted upload formats as (content type, ((offset, signature), ...)); all signatures must match
+IMAGE_SIGNATURES = (
+    ("image/jpeg", ((0, b"\xff\xd8\xff"),)),
+    ("image/png", ((0, b"\x89PNG\r\n\x1a\n"),)),
+    ("image/webp", ((0, b"RIFF"), (8, b"WEBP"))),
+    ("image/avif", ((4, b"ftypavif"),)),
+    ("image/avif", ((4, b"ftypavis"),)),
+)
+
+
+async def sniff_image_type(file: UploadFile) -> Optional[str]:
+    """Detect the image type from the file's magic bytes, ignoring the client-sent MIME type."""
+    header = await file.read(16)
+    await file.seek(0)
+    for content_type, signatures in IMAGE_SIGNATURES:
+        if all(header[offset:offset + len(sig)] == sig for offset, sig in signatures):
+            return content_type
+    return None
+
+
+@functools.lru_cache(maxsize=4096)
+def _stem(name: str) -> str:
+    """Filename without extension, cached since the same names are formatted on every listing."""
+    return Path(name).stem
+
+
+def _generate_filename(original_name: str, variant: dict) -> str:
+    """Generate filename for image variant."""
+    return f"{_stem(original_name)}{variant['suffix']}.{variant['format']}"
+
+
+def _variant_info(upload_dir: Path, variant: dict, variant_path: Path, width: int, height: int) -> dict:
+    """Describe a saved variant for storage in Costume.images."""
+    return {
+        "format": variant['format'],
+        "width": width,
+        "height": height,
+        "quality": variant['quality'],
+        "path": str(variant_path.relative_to(upload_dir)),
+        "size": variant_path.stat().st_size,
+        "suffix": variant['suffix'],
+    }
+
+
+def _resize_vips(path: Path, width: int, height: int):
+    """Fit an image file into width x height with libvips."""
+    # thumbnail shrinks on load, decoding only the pixels it needs
+    image = pyvips.Image.thumbnail(str(path), width, height=height, size="down")
+
+    # Flatten transparency onto white, same as the PIL path
+    if image.hasalpha():
+        image = image.flatten(background=[255, 255, 255])
+
+    # Render once: the result is saved in several formats
+    return image.copy_memory()
+
+
+def _save_variant_vips(upload_dir: Path, image, variant: dict, image_dir: Path, original_name: str) -> dict:
+    """Save an already-sized image variant with libvips."""
+    filename = _generate_filename(original_name, variant)
+    variant_path = image_dir / filename
+
+    if variant['format'] == 'avif':
+        try:
+            # libvips effort is the inverse of the AV1 encoder speed
+            image.heifsave(
+                str(variant_path),
+                Q=variant['quality'],
+                compression="av1",
+                effort=max(0, 9 - settings.AVIF_SPEED),
+                subsample_mode="on",
+                strip=True,
+            )
+        except pyvips.Error:
+            # Fallback to WebP if libvips was built without libheif/AV1
+            variant_path = variant_path.with_suffix('.webp')
+            image.webpsave(str(variant_path), Q=variant['quality'], strip=True)
+    else:
+        image.write_to_file(str(variant_path), Q=variant['quality'], strip=True)
+
+    return _variant_info(upload_dir, variant, variant_path, image.width, image.height)
+
+
+def _fit(size: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+    """Largest size within box that keeps the aspect ratio, never upscaling."""
+    width, height = size
+    scale = min(box[0] / width, box[1] / height, 1)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _resize_pil(image: Image.Image, width: int, height: int) -> Image.Image:
+    """Fit an image into width x height with PIL, maintaining aspect ratio."""
+    new_size = _fit(image.size, (width, height))
+    if new_size == image.size:
+        # Already fits; saving never mutates, so the same image can be reused
+        return image
+    # resize returns a new image, so there is no need to copy the source first
+    return image.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+
+def _save_variant_pil(upload_dir: Path, image: Image.Image, variant: dict, image_dir: Path, original_name: str) -> dict:
+    """Save an already-sized image variant with PIL."""
+    # Generate filename
+    filename = _generate_filename(original_name, variant)
+    variant_path = image_dir / filename
+
+    # Save in specified format
+    save_kwargs = {'quality': variant['quality']}
+
+    if variant['format'] == 'webp':
+        image.save(variant_path, 'WEBP', **save_kwargs)
+    elif variant['format'] == 'avif':
+        # Note: PIL may need AVIF support compiled in
+        try:
+            image.save(
+                variant_path,
+                'AVIF',
+                speed=settings.AVIF_SPEED,
+                subsampling='4:2:0',
+                max_threads=settings.IMAGE_ENCODER_THREADS,
+                **save_kwargs,
+            )
+        except:
+            # Fallback to WebP if AVIF not supported
+            image.save(variant_path.with_suffix('.webp'), 'WEBP', **save_kwargs)
+            variant_path = variant_path.with_suffix('.webp')
+    else:  # jpg
+        image.save(variant_path, 'JPEG', **save_kwargs)
+
+    return _variant_info(upload_dir, variant, variant_path, image.width, image.height)
+
+
+def _decode_for_pil(path: Path, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """Open an image file with PIL and flatten to RGB; ``size`` lets JPEGs decode at a reduced scale."""
+    image = Image.open(path)
+    if size is not None:
+        # No-op for formats without scaled decoding; JPEG keeps at least the requested size
+        image.draft('RGB', size)
+
+    # Flatten transparency onto white (for JPEG compatibility); paste reads the
+    # alpha band of an RGBA mask directly, so no split() into separate bands
+    if image.mode in ('RGBA', 'LA', 'P'):
+        rgba = image if image.mode == 'RGBA' else image.convert('RGBA')
+        image = Image.new('RGB', rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba)
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    image.load()
+    return image
+
+
+def _encode_size_group(upload_dir: str, original_path: str, size: Tuple[int, int], group: list) -> list:
+    """Generate all formats of one variant size from a stored original; runs in the encode process pool."""
+    # Returns (variant, info, error) tuples, errors as strings so they always pickle
+    upload_dir = Path(upload_dir)
+    original_path = Path(original_path)
+    image_dir = original_path.parent
+    width, height = size
+
+    # Decode and resize once per size, then encode that image in each format
+    if pyvips is not None:
+        image = _resize_vips(original_path, width, height)
+        save = _save_variant_vips
+    else:
+        image = _resize_pil(_decode_for_pil(original_path, size), width, height)
+        save = _save_variant_pil
+
+    results = []
+    for variant in group:
+        try:
+            results.append((variant, save(upload_dir, image, variant, image_dir, original_path.name), None))
+        except Exception as e:
+            results.append((variant, None, str(e)))
+    return results
+
 
 @dataclass
 class ImageVariant:
@@ -27,141 +241,147 @@ class ImageProcessor:
         self.upload_dir = Path(upload_dir)
         self.upload_dir.mkdir(parents=True, exist_ok=True)
 
-        # Define image variants to generate
-        self.variants = [
-            # Thumbnail
-            {"format": "webp", "width": 200, "height": 200, "quality": 80, "suffix": "_thumb"},
-            {"format": "avif", "width": 200, "height": 200, "quality": 80, "suffix": "_thumb"},
-            {"format": "jpg", "width": 200, "height": 200, "quality": 80, "suffix": "_thumb"},
-            # Medium
-            {"format": "webp", "width": 800, "height": 800, "quality": 85, "suffix": "_medium"},
-            {"format": "avif", "width": 800, "height": 800, "quality": 85, "suffix": "_medium"},
-            {"format": "jpg", "width": 800, "height": 800, "quality": 85, "suffix": "_medium"},
-            # Large
-            {"format": "webp", "width": 1920, "height": 1920, "quality": 90, "suffix": "_large"},
-            {"format": "avif", "width": 1920, "height": 1920, "quality": 90, "suffix": "_large"},
-            {"format": "jpg", "width": 1920, "height": 1920, "quality": 90, "suffix": "_large"},
+        self.variants = IMAGE_VARIANTS
+
+        # Variants grouped by target size, largest first; each size is one encode job
+        by_size = sorted(self.variants, key=lambda v: v['width'] * v['height'], reverse=True)
+        self._size_groups = [
+            (size, list(group))
+            for size, group in itertools.groupby(by_size, key=lambda v: (v['width'], v['height']))
         ]
 
-    def _generate_filename(self, original_name: str, variant: dict) -> str:
-        """Generate filename for image variant."""
-        name_without_ext = Path(original_name).stem
-        return f"{name_without_ext}{variant['suffix']}.{variant['format']}"
+        # Filename tails per size for URL building, e.g. "thumb" -> [("webp", "_thumb.webp"), ...]
+        self._url_tails = {}
+        for variant in self.variants:
+            self._url_tails.setdefault(variant['suffix'][1:], []).append(
+                (variant['format'], f"{variant['suffix']}.{variant['format']}")
+            )
+
+        # Pool that runs _encode_size_group; the app installs a process pool at
+        # startup, None falls back to the event loop's default thread pool
+        self.executor: Optional[Executor] = None
+
+        # One lock per content hash being processed; entries vanish once no task holds them
+        self._hash_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
 
-    def _calculate_hash(self, content: bytes) -> str:
-        """Calculate MD5 hash of image content."""
-        return hashlib.md5(content).hexdigest()
+    def _hash_lock(self, file_hash: str) -> asyncio.Lock:
+        lock = self._hash_locks.get(file_hash)
+        if lock is None:
+            lock = self._hash_locks[file_hash] = asyncio.Lock()
+        return lock
+
+    async def _receive_upload(self, file: UploadFile) -> Tuple[Path, str]:
+        """Stream an upload into a temporary file, returning its path and content hash."""
+        # OpenSSL uses the SHA-NI extensions where available; 16 bytes is plenty for a directory name
+        hasher = hashlib.sha256()
+        fd, tmp_name = tempfile.mkstemp(dir=self.upload_dir, suffix=".part")
+        os.close(fd)
+        tmp_path = Path(tmp_name)
+
+        try:
+            async with aiofiles.open(tmp_path, 'wb') as f:
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    hasher.update(chunk)
+                    await f.write(chunk)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        return tmp_path, hasher.hexdigest()[:32]
 
     async def process_image(self, file: UploadFile) -> dict:
         """Process uploaded image and generate all variants."""
         try:
-            # Read file content
-            content = await file.read()
-
-            # Calculate hash for unique identifier
-            file_hash = self._calculate_hash(content)
-
-            # Create directory for this image
-            image_dir = self.upload_dir / file_hash
-            image_dir.mkdir(exist_ok=True)
-
-            # Save original
-            original_path = image_dir / file.filename
-            async with aiofiles.open(original_path, 'wb') as f:
-                await f.write(content)
-
-            # Open image with PIL
-            image = Image.open(BytesIO(content))
-
-            # Convert RGBA to RGB if needed (for JPEG compatibility)
-            if image.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                if image.mode == 'P':
-                    image = image.convert('RGBA')
-                background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                image = background
-            elif image.mode != 'RGB':
-                image = image.convert('RGB')
-
-            # Generate variants
-            variants_created = []
-
-            for variant in self.variants:
-                try:
-                    # Resize image maintaining aspect ratio
-                    img_copy = image.copy()
-                    img_copy.thumbnail((variant['width'], variant['height']), Image.Resampling.LANCZOS)
-
-                    # Generate filename
-                    filename = self._generate_filename(file.filename, variant)
-                    variant_path = image_dir / filename
-
-                    # Save in specified format
-                    save_kwargs = {'quality': variant['quality']}
-
-                    if variant['format'] == 'webp':
-                        img_copy.save(variant_path, 'WEBP', **save_kwargs)
-                    elif variant['format'] == 'avif':
-                        # Note: PIL may need AVIF support compiled in
-                        try:
-                            img_copy.save(variant_path, 'AVIF', **save_kwargs)
-                        except:
-                            # Fallback to WebP if AVIF not supported
-                            img_copy.save(variant_path.with_suffix('.webp'), 'WEBP', **save_kwargs)
-                            variant_path = variant_path.with_suffix('.webp')
-                    else:  # jpg
-                        img_copy.save(variant_path, 'JPEG', **save_kwargs)
-
-                    variants_created.append(
-                        {
-                            "format": variant['format'],
-                            "width": img_copy.width,
-                            "height": img_copy.height,
-                            "quality": variant['quality'],
-                            "path": str(variant_path.relative_to(self.upload_dir)),
-                            "size": variant_path.stat().st_size,
-                            "suffix": variant['suffix'],
-                        }
+            # Stream to disk; the content hash is the unique identifier
+            tmp_path, file_hash = await self._receive_upload(file)
+
+            # Identical content (e.g. the same file attached twice) is encoded once;
+            # later callers wait here and then reuse the manifest
+            async with self._hash_lock(file_hash):
+                # Create directory for this image
+                image_dir = self.upload_dir / file_hash
+                image_dir.mkdir(exist_ok=True)
+
+                # Same content was processed before; the manifest is only written once all variants exist
+                manifest_path = image_dir / MANIFEST_NAME
+                if manifest_path.exists():
+                    tmp_path.unlink(missing_ok=True)
+                    async with aiofiles.open(manifest_path, 'r') as f:
+                        return json.loads(await f.read())
+
+                # Move original into place
+                original_path = image_dir / file.filename
+                os.replace(tmp_path, original_path)
+
+                # Encoding is CPU-bound; keep it off the event loop and out of this process,
+                # with one job per size so the sizes of a single upload encode in parallel
+                loop = asyncio.get_running_loop()
+                group_results = await asyncio.gather(*(
+                    loop.run_in_executor(
+                        self.executor, _encode_size_group, str(self.upload_dir), str(original_path), size, group
                     )
+                    for size, group in self._size_groups
+                ))
 
-                except Exception as e:
-                    logger.error(f"Failed to create variant {variant}: {e}")
-                    continue
+                variants_created = []
+                for variant, info, error in itertools.chain.from_iterable(group_results):
+                    if error is not None:
+                        logger.error(f"Failed to create variant {variant}: {error}")
+                        continue
+                    variants_created.append(info)
 
-            return {
-                "original_name": file.filename,
-                "hash": file_hash,
-                "original_path": str(original_path.relative_to(self.upload_dir)),
-                "variants": variants_created,
-                "total_size": sum(v['size'] for v in variants_created),
-            }
+                image_info = {
+                    "original_name": file.filename,
+                    "hash": file_hash,
+                    "original_path": str(original_path.relative_to(self.upload_dir)),
+                    "variants": variants_created,
+                    "total_size": sum(v['size'] for v in variants_created),
+                }
+
+                # Write then rename so a crash never leaves a partial manifest behind; the
+                # temp name is unique so concurrent writers for the same hash never collide
+                fd, manifest_tmp = tempfile.mkstemp(dir=image_dir, suffix=".tmp")
+                os.close(fd)
+                try:
+                    async with aiofiles.open(manifest_tmp, 'w') as f:
+                        await f.write(json.dumps(image_info))
+                    os.replace(manifest_tmp, manifest_path)
+                except BaseException:
+                    Path(manifest_tmp).unlink(missing_ok=True)
+                    raise
+
+                return image_info
 
         except Exception as e:
             logger.error(f"Image processing failed: {e}")
             raise
 
-    async def delete_image(self, image_hash: str):
+    async def delete_image(self, image_hash: str) -> None:
         """Delete all files for an image."""
-        image_dir = self.upload_dir / image_hash
-        if image_dir.exists():
-            import shutil
+        # ignore_errors covers a missing directory without a separate exists() check
+        await asyncio.to_thread(shutil.rmtree, self.upload_dir / image_hash, ignore_errors=True)
 
-            shutil.rmtree(image_dir)
-            return True
-        return False
+    async def delete_images(self, image_hashes: List[str]) -> None:
+        """Delete the files of several images concurrently."""
+        await asyncio.gather(*(self.delete_image(image_hash) for image_hash in image_hashes))
 
     def get_image_urls(self, image_hash: str, original_name: str) -> dict:
         """Generate URLs for all image variants."""
-        base_url = "/uploads"
-        image_dir = Path(image_hash)
-
-        urls = {"original": f"{base_url}/{image_dir}/{original_name}", "variants": {}}
+        base = f"{UPLOADS_URL}/{image_hash}"
+        prefix = f"{base}/{_stem(original_name)}"
 
-        for variant in self.variants:
-            filename = self._generate_filename(original_name, variant)
-            urls["variants"][variant['suffix'][1:]] = {variant['format']: f"{base_url}/{image_dir}/{filename}"}
+        return {
+            "original": f"{base}/{original_name}",
+            "variants": {
+                size: {fmt: prefix + tail for fmt, tail in tails}
+                for size, tails in self._url_tails.items()
+            },
+        }
 
-        return urls
+    def get_thumbnail_url(self, image_hash: str, original_name: str) -> str:
+        """URL of the preferred thumbnail (webp, then avif, then jpg) without building every variant."""
+        _fmt, tail = self._url_tails["thumb"][0]
+        return f"{UPLOADS_URL}/{image_hash}/{_stem(original_name)}{tail}"
 
 
 # Global instance
@@ -1,10 +1,46 @@
+import asyncio
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import time
+from cachetools import TLRUCache, TTLCache
 from passlib.context import CryptContext
 from datetime import timezone, datetime, timedelta
-from typing import Any, Union
+from typing import Any, Optional, Tuple, Union
 from jose import JWTError, jwt
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__memory_cost=settings.ARGON2_MEMORY_COST,
+    argon2__time_cost=settings.ARGON2_TIME_COST,
+    argon2__parallelism=settings.ARGON2_PARALLELISM,
+)
+
+# Dedicated workers for argon2 (releases the GIL), so a burst of logins cannot
+# starve the shared default executor used by file I/O. Created on first use and
+# dropped on shutdown, so a later app startup in the same process gets a fresh pool
+_hash_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _get_hash_pool() -> ThreadPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ThreadPoolExecutor(
+            max_workers=min(8, (os.cpu_count() or 1) * 2),
+            thread_name_prefix="password-hash",
+        )
+    return _hash_pool
+
+
+def shutdown_hash_pool() -> None:
+    """Stop the password hashing workers; the next hash starts a new pool."""
+    global _hash_pool
+    pool, _hash_pool = _hash_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -17,6 +53,18 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_hash_pool(), verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_hash_pool(), get_password_hash, password)
+
+
 def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None) -> str:
     """Create a JWT access token."""
     if expires_delta:
@@ -38,10 +86,63 @@ def create_refresh_token(subject: Union[str, Any]) -> str:
     return encoded_jwt
 
 
+# Recently minted (access, refresh) pairs per user; repeated /me or /refresh calls
+# within the TTL reuse them instead of signing two new JWTs each time
+TOKEN_PAIR_CACHE_TTL = 1  # seconds
+_token_pair_cache = TTLCache(maxsize=10_000, ttl=TOKEN_PAIR_CACHE_TTL)
+_token_pair_cache_lock = threading.Lock()
+
+
+def create_token_pair(user_id: int) -> Tuple[str, str]:
+    """Create (access, refresh) tokens for a user, reusing a pair minted within the last second."""
+    with _token_pair_cache_lock:
+        pair = _token_pair_cache.get(user_id)
+    if pair is None:
+        pair = (create_access_token(subject=user_id), create_refresh_token(subject=user_id))
+        with _token_pair_cache_lock:
+            _token_pair_cache[user_id] = pair
+    return pair
+
+
+# Decoded access tokens, each kept until the earlier of its exp claim or TOKEN_CACHE_TTL.
+# Keyed by a 16-byte digest of the token rather than the token string itself
+TOKEN_CACHE_TTL = 60
+
+
+def _token_ttu(_key: bytes, payload: dict, now: float) -> float:
+    return min(now + TOKEN_CACHE_TTL, payload["exp"])
+
+
+def token_digest(token: str) -> bytes:
+    """Fixed-size cache key for a bearer token, so caches never hold the raw JWT."""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+_token_cache = TLRUCache(maxsize=10_000, ttu=_token_ttu, timer=time.time)
+_token_cache_lock = threading.Lock()
+
+
 def verify_token(token: str) -> dict:
     """Verify and decode a JWT token."""
+    key = token_digest(token)
+    with _token_cache_lock:
+        payload = _token_cache.get(key)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
         return None
+
+    # Refresh tokens are used once per rotation, not worth caching
+    if payload.get("type") == "access" and "exp" in payload:
+        with _token_cache_lock:
+            _token_cache[key] = payload
+    return payload
+
+
+def forget_token(token: str) -> None:
+    """Drop a token's cached decode, e.g. on logout."""
+    with _token_cache_lock:
+        _token_cache.pop(token_digest(token), None)
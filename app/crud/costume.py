@@ -1,33 +1,111 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, or_, and_
+from sqlalchemy import Row, bindparam, select, update, delete, or_, and_, func, tuple_
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
 from fastapi import HTTPException, status, UploadFile
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime
+import asyncio
+import base64
 import json
 
+from app.db.database import LIST_LOAD_OPTIONS
 from app.models.costume import Costume, Gender, AgeCategory
 from app.schemas.costume import CostumeCreate, CostumeUpdate, CostumeFilter, ImageInfo
-from app.core.images import image_processor
+from app.core.images import image_processor, sniff_image_type
+from app.core.cache import invalidate_costumes
 from app.models.user import UserRole
 
+# Columns behind a public list item (plus created_at for the cursor); skips the text/array fields
+_LIST_COLUMNS = (
+    Costume.id, Costume.name, Costume.price, Costume.gender, Costume.age_category,
+    Costume.tags, Costume.images, Costume.is_active, Costume.created_at,
+)
+
+# Statement templates built once per process; Select is immutable, so each request
+# only extends a shared base instead of rebuilding it (compiled SQL is cached by SQLAlchemy)
+_COSTUME_BY_ID = select(Costume).where(Costume.id == bindparam("costume_id"))
+_ACTIVE_COSTUME_BY_ID = _COSTUME_BY_ID.where(Costume.is_active.is_(True))
+_COSTUME_ROWS = select(Costume).options(*LIST_LOAD_OPTIONS)
+_LIST_ROWS = select(*_LIST_COLUMNS)
+_LIST_ORDER = (Costume.created_at.desc(), Costume.id.desc())
+
 class CostumeCRUD:
+    @staticmethod
+    async def _validate_image(image: UploadFile) -> None:
+        """Reject uploads that are not a supported image or are too large."""
+        if image.size > 10 * 1024 * 1024:  # 10MB limit
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Image too large (max 10MB)"
+            )
+        
+        # Trust the file's magic bytes, not the client-provided content type
+        if await sniff_image_type(image) is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid image type: {image.content_type}"
+            )
+    
+    @staticmethod
+    async def _process_images(images: List[UploadFile]) -> List[dict]:
+        """Validate all uploads, then stream and encode them concurrently, keeping their order."""
+        for image in images:
+            await CostumeCRUD._validate_image(image)
+        
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tasks = [tg.create_task(image_processor.process_image(image)) for image in images]
+        except ExceptionGroup as eg:
+            # The first failure cancels the remaining uploads
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Failed to process image: {str(eg.exceptions[0])}"
+            )
+        return [task.result() for task in tasks]
+    
     @staticmethod
     async def get_by_id(db: AsyncSession, costume_id: int) -> Optional[Costume]:
         """Get costume by ID."""
-        result = await db.execute(
-            select(Costume).where(Costume.id == costume_id)
-        )
+        result = await db.execute(_COSTUME_BY_ID, {"costume_id": costume_id})
         return result.scalar_one_or_none()
     
     @staticmethod
-    async def get_multi(
-        db: AsyncSession, 
-        skip: int = 0, 
-        limit: int = 100,
-        filters: Optional[CostumeFilter] = None
-    ) -> List[Costume]:
-        """Get multiple costumes with optional filters."""
-        query = select(Costume)
+    async def get_active_by_id(db: AsyncSession, costume_id: int) -> Optional[Costume]:
+        """Get costume by ID only if it is active; inactive rows never leave Postgres."""
+        result = await db.execute(_ACTIVE_COSTUME_BY_ID, {"costume_id": costume_id})
+        return result.scalar_one_or_none()
+    
+    @staticmethod
+    def encode_cursor(costume: Costume) -> str:
+        """Build an opaque keyset cursor pointing just past this costume."""
+        raw = f"{costume.created_at.isoformat()}|{costume.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        """Parse a cursor produced by encode_cursor."""
+        try:
+            created_at, _, costume_id = base64.urlsafe_b64decode(cursor.encode()).decode().rpartition("|")
+            return datetime.fromisoformat(created_at), int(costume_id)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor",
+            )
+    
+    @staticmethod
+    def _paginate(
+        query,
+        skip: int,
+        limit: int,
+        filters: Optional[CostumeFilter],
+        after: Optional[Tuple[datetime, int]],
+        is_active: Optional[bool]
+    ):
+        """Apply list filters, keyset/offset pagination and ordering to a costume select."""
+        if is_active is not None:
+            query = query.where(Costume.is_active == is_active)
         
         if filters:
             # Apply filters
@@ -46,9 +124,8 @@ class CostumeCRUD:
                 conditions.append(Costume.size == filters.size)
             
             if filters.tags:
-                # Find costumes that have ALL specified tags
-                for tag in filters.tags:
-                    conditions.append(Costume.tags.contains([tag]))
+                # Find costumes that have ALL specified tags (single tags @> ARRAY[...])
+                conditions.append(Costume.tags.contains(filters.tags))
             
             if filters.min_price is not None:
                 conditions.append(Costume.price >= filters.min_price)
@@ -65,10 +142,50 @@ class CostumeCRUD:
             if conditions:
                 query = query.where(and_(*conditions))
         
-        query = query.order_by(Costume.created_at.desc()).offset(skip).limit(limit)
+        if after is not None:
+            # Seek past the cursor instead of scanning and discarding skipped rows
+            query = query.where(tuple_(Costume.created_at, Costume.id) < tuple_(*after))
+        else:
+            query = query.offset(skip)
+        
+        return query.order_by(*_LIST_ORDER).limit(limit)
+    
+    @staticmethod
+    async def get_multi(
+        db: AsyncSession, 
+        skip: int = 0, 
+        limit: int = 100,
+        filters: Optional[CostumeFilter] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        is_active: Optional[bool] = None
+    ) -> List[Costume]:
+        """Get multiple costumes with optional filters.
+        
+        Pass ``after`` (a decoded cursor) for keyset pagination; ``skip`` is
+        only applied when no cursor is given. ``is_active`` filters without
+        building a CostumeFilter.
+        """
+        query = CostumeCRUD._paginate(_COSTUME_ROWS, skip, limit, filters, after, is_active)
         result = await db.execute(query)
         return result.scalars().all()
     
+    @staticmethod
+    async def get_multi_list(
+        db: AsyncSession, 
+        skip: int = 0, 
+        limit: int = 100,
+        filters: Optional[CostumeFilter] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        is_active: Optional[bool] = None
+    ) -> List[Row]:
+        """Like get_multi, but fetch only the columns a list item needs, as plain rows.
+        
+        Rows still have ``id`` and ``created_at``, so they work with encode_cursor.
+        """
+        query = CostumeCRUD._paginate(_LIST_ROWS, skip, limit, filters, after, is_active)
+        result = await db.execute(query)
+        return result.all()
+    
     @staticmethod
     async def create(
         db: AsyncSession, 
@@ -89,27 +206,7 @@ class CostumeCRUD:
         # Process images if provided
         processed_images = []
         if images:
-            for image in images:
-                if image.content_type not in ['image/jpeg', 'image/png', 'image/webp', 'image/avif']:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Invalid image type: {image.content_type}"
-                    )
-                
-                if image.size > 10 * 1024 * 1024:  # 10MB limit
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Image too large (max 10MB)"
-                    )
-                
-                try:
-                    image_info = await image_processor.process_image(image)
-                    processed_images.append(image_info)
-                except Exception as e:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Failed to process image: {str(e)}"
-                    )
+            processed_images = await CostumeCRUD._process_images(images)
         
         # Create costume
         db_costume = Costume(
@@ -128,6 +225,7 @@ class CostumeCRUD:
                 detail="Failed to create costume",
             )
         
+        invalidate_costumes()
         return db_costume
     
     @staticmethod
@@ -147,44 +245,26 @@ class CostumeCRUD:
             )
         
         # Update basic fields
-        update_data = costume_data.dict(exclude_unset=True)
+        update_data = costume_data.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             setattr(costume, field, value)
         
         # Remove images if requested
         if remove_image_hashes:
             images_to_keep = []
+            hashes_to_delete = []
             for img in costume.images:
                 if img['hash'] not in remove_image_hashes:
                     images_to_keep.append(img)
                 else:
-                    # Delete image files
-                    await image_processor.delete_image(img['hash'])
+                    hashes_to_delete.append(img['hash'])
+            # Delete image files
+            await image_processor.delete_images(hashes_to_delete)
             costume.images = images_to_keep
         
         # Add new images
         if add_images:
-            for image in add_images:
-                if image.content_type not in ['image/jpeg', 'image/png', 'image/webp', 'image/avif']:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Invalid image type: {image.content_type}"
-                    )
-                
-                if image.size > 10 * 1024 * 1024:  # 10MB limit
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Image too large (max 10MB)"
-                    )
-                
-                try:
-                    image_info = await image_processor.process_image(image)
-                    costume.images.append(image_info)
-                except Exception as e:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Failed to process image: {str(e)}"
-                    )
+            costume.images = costume.images + await CostumeCRUD._process_images(add_images)
         
         try:
             await db.commit()
@@ -196,6 +276,7 @@ class CostumeCRUD:
                 detail="Failed to update costume",
             )
         
+        invalidate_costumes(costume_id)
         return costume
     
     @staticmethod
@@ -209,11 +290,11 @@ class CostumeCRUD:
             )
         
         # Delete associated images
-        for img in costume.images:
-            await image_processor.delete_image(img['hash'])
+        await image_processor.delete_images([img['hash'] for img in costume.images])
         
         await db.delete(costume)
         await db.commit()
+        invalidate_costumes(costume_id)
         return True
     
     @staticmethod
@@ -224,13 +305,28 @@ class CostumeCRUD:
         limit: int = 50
     ) -> List[Costume]:
         """Search costumes by name, description, or tags."""
-        search_query = select(Costume).where(
-            or_(
+        # Exact tag hit (any word of the query), served by the GIN index on tags
+        tag_match = Costume.tags.overlap(query.split() or [query])
+        
+        if len(query) < 3:
+            # Too short for useful full-text matching, fall back to substring search
+            condition = or_(
                 Costume.name.ilike(f"%{query}%"),
                 Costume.description.ilike(f"%{query}%"),
-                Costume.items.ilike(f"%{query}%")
+                Costume.items.ilike(f"%{query}%"),
+                tag_match
             )
-        ).where(Costume.is_active == True).offset(skip).limit(limit)
+            order = Costume.created_at.desc()
+        else:
+            # Same expression as ix_costumes_search_tsv, so the planner can
+            # combine both GIN indexes with a BitmapOr
+            ts_query = func.plainto_tsquery("simple", query)
+            condition = or_(Costume.search_tsv.op("@@")(ts_query), tag_match)
+            order = func.ts_rank(Costume.search_tsv, ts_query).desc()
+        
+        search_query = _COSTUME_ROWS.where(condition).where(
+            Costume.is_active == True
+        ).order_by(order).offset(skip).limit(limit)
         
         result = await db.execute(search_query)
         return result.scalars().all()
@@ -241,16 +337,13 @@ class CostumeCRUD:
         costume_id: int
     ) -> List[Costume]:
         """Get costumes related to the specified costume."""
-        costume = await CostumeCRUD.get_by_id(db, costume_id)
-        if not costume:
-            return []
-        
-        if not costume.related_costumes:
-            return []
+        # Resolve the parent's related ids inside the same query (one round-trip)
+        parent = aliased(Costume)
+        related_ids = select(func.unnest(parent.related_costumes)).where(parent.id == costume_id)
         
         result = await db.execute(
-            select(Costume).where(
-                Costume.id.in_(costume.related_costumes),
+            _COSTUME_ROWS.where(
+                Costume.id.in_(related_ids),
                 Costume.is_active == True
             )
         )
@@ -263,45 +356,55 @@ class CostumeCRUD:
         delta: int  # Positive to add, negative to subtract
     ) -> Costume:
         """Update costume amount (for inventory management)."""
-        costume = await CostumeCRUD.get_by_id(db, costume_id)
+        # Atomic increment: no read-modify-write race between concurrent updates
+        result = await db.execute(
+            update(Costume)
+            .where(Costume.id == costume_id, Costume.amount + delta >= 0)
+            .values(amount=Costume.amount + delta)
+            .returning(Costume)
+            .execution_options(synchronize_session=False)
+        )
+        costume = result.scalar_one_or_none()
         if not costume:
+            # Tell a missing costume apart from an amount that would go negative
+            if await CostumeCRUD.get_by_id(db, costume_id):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Cannot reduce amount below zero",
+                )
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Costume not found",
             )
         
-        new_amount = costume.amount + delta
-        if new_amount < 0:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Cannot reduce amount below zero",
-            )
-        
-        costume.amount = new_amount
         await db.commit()
-        await db.refresh(costume)
+        invalidate_costumes(costume_id)
         return costume
     
     @staticmethod
     def format_for_public(costume: Costume) -> Dict[str, Any]:
         """Format costume data for public view."""
-        # Generate image URLs for public
-        image_urls = []
-        for img in costume.images:
-            urls = image_processor.get_image_urls(img['hash'], img['original_name'])
-            image_urls.append(urls)
-        
-        return {
-            "id": costume.id,
-            "name": costume.name,
-            "description": costume.description,
-            "price": costume.price,
-            "gender": costume.gender.value,
-            "age_category": costume.age_category.value,
-            "size": costume.size,
-            "tags": costume.tags,
-            "items": costume.items,
-            "images": image_urls,
-            "created_at": costume.created_at,
-            "is_active": costume.is_active
-        }
\ No newline at end of file
+        return CostumeCRUD.format_many_for_public([costume])[0]
+    
+    @staticmethod
+    def format_many_for_public(costumes: List[Costume]) -> List[Dict[str, Any]]:
+        """Format several costumes for public view in one pass."""
+        # Image URLs are built from the processor's precomputed variant tables
+        get_image_urls = image_processor.get_image_urls
+        return [
+            {
+                "id": costume.id,
+                "name": costume.name,
+                "description": costume.description,
+                "price": costume.price,
+                "gender": costume.gender,
+                "age_category": costume.age_category,
+                "size": costume.size,
+                "tags": costume.tags,
+                "items": costume.items,
+                "images": [get_image_urls(img['hash'], img['original_name']) for img in costume.images],
+                "created_at": costume.created_at,
+                "is_active": costume.is_active
+            }
+            for costume in costumes
+        ]
\ No newline at end of file
@@ -1,31 +1,83 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, or_, bindparam
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
-from app.models.user import User, UserRole
+from app.db.database import LIST_LOAD_OPTIONS
+from app.models.user import User, UserRole, user_search_text
 from app.schemas.user import UserCreate, UserUpdate, AdminUserUpdate
-from app.core.security import get_password_hash, verify_password
-from typing import List, Optional
+from app.core.security import get_password_hash, get_password_hash_async, verify_password_async
+from app.core.cache import invalidate_user
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    # Annotation only; app.dependencies.auth loads users through UserCRUD
+    from app.dependencies.auth import CurrentUserCtx
+
+# Hot lookups built once so every call hits the compiled-statement cache
+_USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+_USER_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+_USER_BY_USERNAME = select(User).where(User.username == bindparam("username"))
+
+# Verified against when the user does not exist, so both outcomes cost one hash
+_DUMMY_HASH = get_password_hash("x" * 24)
 
 class UserCRUD:
     @staticmethod
     async def get_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
         """Get user by ID."""
-        result = await db.execute(select(User).where(User.id == user_id))
+        result = await db.execute(_USER_BY_ID, {"user_id": user_id})
         return result.scalar_one_or_none()
 
     @staticmethod
     async def get_by_email(db: AsyncSession, email: str) -> Optional[User]:
         """Get user by email."""
-        result = await db.execute(select(User).where(User.email == email))
+        result = await db.execute(_USER_BY_EMAIL, {"email": email})
         return result.scalar_one_or_none()
 
     @staticmethod
     async def get_by_username(db: AsyncSession, username: str) -> Optional[User]:
         """Get user by username."""
-        result = await db.execute(select(User).where(User.username == username))
+        result = await db.execute(_USER_BY_USERNAME, {"username": username})
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def update_fields(db: AsyncSession, user_id: int, *criteria, **values) -> Optional[User]:
+        """Update columns of a user in one UPDATE ... RETURNING; None if no row matched."""
+        stmt = (
+            update(User)
+            .where(User.id == user_id, *criteria)
+            .values(**values)
+            .returning(User)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(stmt)
         return result.scalar_one_or_none()
 
+    @staticmethod
+    async def bulk_update_fields(db: AsyncSession, user_ids: List[int], *criteria, **values) -> List[int]:
+        """Update columns of many users in one UPDATE; returns the ids that matched."""
+        stmt = (
+            update(User)
+            .where(User.id.in_(user_ids), *criteria)
+            .values(**values)
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(stmt)
+        return list(result.scalars())
+
+    @staticmethod
+    async def bulk_delete(db: AsyncSession, user_ids: List[int], *criteria) -> List[int]:
+        """Delete many users in one DELETE; returns the ids that were removed."""
+        stmt = (
+            delete(User)
+            .where(User.id.in_(user_ids), *criteria)
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(stmt)
+        return list(result.scalars())
+
     @staticmethod
     async def authenticate(db: AsyncSession, identifier: str, password: str) -> Optional[User]:
         """Authenticate user by email/username and password."""
@@ -36,8 +88,9 @@ class UserCRUD:
             user = await UserCRUD.get_by_username(db, identifier)
         
         if not user:
+            await verify_password_async(password, _DUMMY_HASH)
             return None
-        if not verify_password(password, user.hashed_password):
+        if not await verify_password_async(password, user.hashed_password):
             return None
         if not user.is_active:
             return None
@@ -47,21 +100,28 @@ class UserCRUD:
     @staticmethod
     async def create(db: AsyncSession, user_data: UserCreate) -> User:
         """Create new user."""
-        # Check if user exists
-        if await UserCRUD.get_by_email(db, user_data.email):
+        # Check if user exists (email and username in one round-trip)
+        result = await db.execute(
+            select(User.email, User.username).where(
+                or_(User.email == user_data.email, User.username == user_data.username)
+            )
+        )
+        existing = result.all()
+        
+        if any(row.email == user_data.email for row in existing):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered",
             )
         
-        if await UserCRUD.get_by_username(db, user_data.username):
+        if existing:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Username already taken",
             )
         
         # Create user
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
         db_user = User(
             email=user_data.email,
             username=user_data.username,
@@ -88,7 +148,7 @@ class UserCRUD:
         db: AsyncSession, 
         user_id: int, 
         user_data: UserUpdate,
-        current_user: User
+        current_user: "CurrentUserCtx"
     ) -> User:
         """Update user (regular users can only update themselves)."""
         if current_user.id != user_id and current_user.role == UserRole.USER:
@@ -108,7 +168,7 @@ class UserCRUD:
         update_data = user_data.dict(exclude_unset=True)
         
         if "password" in update_data:
-            update_data["hashed_password"] = get_password_hash(update_data.pop("password"))
+            update_data["hashed_password"] = await get_password_hash_async(update_data.pop("password"))
         
         for field, value in update_data.items():
             setattr(user, field, value)
@@ -123,6 +183,7 @@ class UserCRUD:
                 detail="Update failed",
             )
         
+        invalidate_user(user_id)
         return user
 
     @staticmethod
@@ -132,24 +193,17 @@ class UserCRUD:
         user_data: AdminUserUpdate
     ) -> User:
         """Admin update user with all fields."""
-        user = await UserCRUD.get_by_id(db, user_id)
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found",
-            )
-        
         update_data = user_data.dict(exclude_unset=True)
         
         if "password" in update_data:
-            update_data["hashed_password"] = get_password_hash(update_data.pop("password"))
-        
-        for field, value in update_data.items():
-            setattr(user, field, value)
+            update_data["hashed_password"] = await get_password_hash_async(update_data.pop("password"))
         
         try:
+            if update_data:
+                user = await UserCRUD.update_fields(db, user_id, **update_data)
+            else:
+                user = await UserCRUD.get_by_id(db, user_id)
             await db.commit()
-            await db.refresh(user)
         except IntegrityError:
             await db.rollback()
             raise HTTPException(
@@ -157,10 +211,17 @@ class UserCRUD:
                 detail="Update failed",
             )
         
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found",
+            )
+        
+        invalidate_user(user_id)
         return user
 
     @staticmethod
-    async def delete(db: AsyncSession, user_id: int, current_user: User) -> bool:
+    async def delete(db: AsyncSession, user_id: int, current_user: "CurrentUserCtx") -> bool:
         """Delete user."""
         if current_user.id != user_id and current_user.role == UserRole.USER:
             raise HTTPException(
@@ -177,6 +238,7 @@ class UserCRUD:
         
         await db.execute(delete(User).where(User.id == user_id))
         await db.commit()
+        invalidate_user(user_id)
         return True
 
     @staticmethod
@@ -184,15 +246,21 @@ class UserCRUD:
         db: AsyncSession,
         skip: int = 0,
         limit: int = 100,
-        active_only: bool = False
+        active_only: bool = False,
+        after_id: Optional[int] = None
     ) -> List[User]:
-        """Get all users with pagination."""
-        query = select(User)
+        """Get all users ordered by id; after_id seeks past a page instead of OFFSET."""
+        query = select(User).options(*LIST_LOAD_OPTIONS).order_by(User.id)
         
         if active_only:
             query = query.where(User.is_active == True)
         
-        query = query.offset(skip).limit(limit)
+        if after_id is not None:
+            query = query.where(User.id > after_id)
+        else:
+            query = query.offset(skip)
+        
+        query = query.limit(limit)
         result = await db.execute(query)
         return result.scalars().all()
 
@@ -204,11 +272,20 @@ class UserCRUD:
         limit: int = 50
     ) -> List[User]:
         """Search users by email, username, or full name."""
-        search_query = select(User).where(
-            (User.email.ilike(f"%{query}%")) |
-            (User.username.ilike(f"%{query}%")) |
-            (User.full_name.ilike(f"%{query}%"))
-        ).offset(skip).limit(limit)
+        if len(query) >= 3:
+            # Served by the pg_trgm GIN index on the combined search text
+            condition = user_search_text.ilike(f"%{query}%")
+        else:
+            # Too short for trigrams; the index cannot help either way
+            condition = (
+                (User.email.ilike(f"%{query}%")) |
+                (User.username.ilike(f"%{query}%")) |
+                (User.full_name.ilike(f"%{query}%"))
+            )
+        
+        search_query = (
+            select(User).options(*LIST_LOAD_OPTIONS).where(condition).offset(skip).limit(limit)
+        )
         
         result = await db.execute(search_query)
         return result.scalars().all()
@@ -218,30 +295,33 @@ class UserCRUD:
         db: AsyncSession,
         user_id: int,
         role: UserRole,
-        admin_user: User
+        admin_user: "CurrentUserCtx"
     ) -> User:
         """Change user role (admin only)."""
-        if admin_user.role not in [UserRole.ADMIN, UserRole.SUPER_ADMIN]:
+        if admin_user.role.rank < UserRole.ADMIN.rank:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not enough permissions",
             )
         
-        user = await UserCRUD.get_by_id(db, user_id)
+        # Super admin cannot be demoted by admin
+        criteria = []
+        if admin_user.role != UserRole.SUPER_ADMIN:
+            criteria.append(User.role != UserRole.SUPER_ADMIN)
+        
+        user = await UserCRUD.update_fields(db, user_id, *criteria, role=role)
         if not user:
+            # Tell a missing user apart from a guarded super admin
+            if await UserCRUD.get_by_id(db, user_id):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Cannot modify super admin",
+                )
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found",
             )
         
-        # Super admin cannot be demoted by admin
-        if user.role == UserRole.SUPER_ADMIN and admin_user.role != UserRole.SUPER_ADMIN:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Cannot modify super admin",
-            )
-        
-        user.role = role
         await db.commit()
-        await db.refresh(user)
+        invalidate_user(user_id)
         return user
\ No newline at end of file
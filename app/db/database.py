@@ -1,14 +1,37 @@
 # app/db/database.py
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool
+from sqlalchemy.orm import sessionmaker, declarative_base, raiseload
 from app.core.config import settings
 
+# Behind PgBouncer in transaction mode, connections are pooled there; prepared statements
+# cannot outlive a transaction and extra startup parameters are rejected, so all are off
+if settings.DB_USE_PGBOUNCER:
+    _pool_kwargs = {"poolclass": NullPool}
+    _connect_args = {"prepared_statement_cache_size": 0, "statement_cache_size": 0}
+else:
+    _pool_kwargs = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+    _connect_args = {
+        # SQLAlchemy's asyncpg adapter cache and asyncpg's own statement cache
+        "prepared_statement_cache_size": 512,
+        "statement_cache_size": 512,
+        # Short OLTP queries only pay JIT compile time, never win it back
+        "server_settings": {"jit": "off"},
+    }
+
 # Create async engine
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=settings.DEBUG,
-    pool_pre_ping=True,
-    pool_recycle=300,
+    query_cache_size=1200,
+    connect_args=_connect_args,
+    **_pool_kwargs,
 )
 
 # Create async session factory
@@ -23,14 +46,19 @@ AsyncSessionLocal = sessionmaker(
 # Base class for models
 Base = declarative_base()
 
+# Loader options for list queries. Relationships read by a list must be eager-loaded
+# (selectinload) in the query; in DEBUG any other lazy load raises, so an N+1 fails loudly
+LIST_LOAD_OPTIONS = (raiseload("*"),) if settings.DEBUG else ()
+
 # Dependency to get DB session
 async def get_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         try:
             yield session
-            await session.commit()
+            # CRUD methods commit their own writes; only flush what a handler left pending.
+            # Read-only requests skip COMMIT and the connection is reset on return to the pool
+            if session.new or session.dirty or session.deleted:
+                await session.commit()
         except Exception:
             await session.rollback()
             raise
-        finally:
-            await session.close()
\ No newline at end of file
@@ -1,5 +1,7 @@
 from app.dependencies.auth import (
+    CurrentUserCtx,
     get_current_user,
+    get_current_user_db,
     get_current_active_user,
     get_current_admin,
     get_current_super_admin,
@@ -7,7 +9,9 @@ from app.dependencies.auth import (
 )
 
 __all__ = [
+    "CurrentUserCtx",
     "get_current_user",
+    "get_current_user_db",
     "get_current_active_user",
     "get_current_admin",
     "get_current_super_admin",
@@ -1,20 +1,109 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.db.database import get_db
+from sqlalchemy import Row, select
+from app.db.database import get_db, engine
 from app.models.user import User, UserRole
-from app.core.security import verify_token
+from app.core.security import token_digest, verify_token
+from app.core.cache import user_ctx_cache
+from app.crud.user import UserCRUD
 
 security = HTTPBearer()
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db)
-) -> User:
-    """Get current authenticated user."""
+# Columns the auth path needs; loading only these skips ORM hydration of the full row
+_AUTH_COLUMNS = (User.id, User.role, User.is_active)
+
+
+class UserLoader:
+    """Coalesce user-by-id lookups issued in the same loop tick into one query."""
+
+    def __init__(self, max_batch_size: int = 128):
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[int, List[asyncio.Future]] = {}
+        self._scheduled = False
+        # The loop only holds weak references to tasks; keep dispatches alive until done
+        self._tasks: Set[asyncio.Task] = set()
+
+    def load(self, user_id: int) -> "asyncio.Future[Optional[Row]]":
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(user_id, []).append(future)
+        if not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(self._start_dispatch, loop)
+        return future
+
+    def _start_dispatch(self, loop: asyncio.AbstractEventLoop) -> None:
+        task = loop.create_task(self._dispatch())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self) -> None:
+        # Take this tick's batch; later calls start a fresh one
+        pending, self._pending = self._pending, {}
+        self._scheduled = False
+        
+        try:
+            await self._load_batches(pending)
+        except BaseException as e:
+            # Never leave a waiter hanging, whatever went wrong (including cancellation)
+            for futures in pending.values():
+                for future in futures:
+                    if future.done():
+                        continue
+                    if isinstance(e, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(e)
+            raise
+
+    async def _load_batches(self, pending: Dict[int, List[asyncio.Future]]) -> None:
+        ids = list(pending)
+        for start in range(0, len(ids), self.max_batch_size):
+            batch = ids[start:start + self.max_batch_size]
+            try:
+                # Own connection: the batch spans requests, and plain rows need no session
+                async with engine.connect() as conn:
+                    result = await conn.execute(select(*_AUTH_COLUMNS).where(User.id.in_(batch)))
+                    users = {row.id: row for row in result}
+            except Exception as e:
+                for user_id in batch:
+                    for future in pending[user_id]:
+                        if not future.done():
+                            future.set_exception(e)
+                continue
+            
+            for user_id in batch:
+                for future in pending[user_id]:
+                    if not future.done():
+                        future.set_result(users.get(user_id))
+
+
+user_loader = UserLoader()
+
+
+@dataclass(frozen=True, slots=True)
+class CurrentUserCtx:
+    """Authenticated user identity; enough for permission checks without loading the row."""
+    id: int
+    role: UserRole
+    is_active: bool
+    exp: Optional[float]  # Access token expiry (unix time); bounds how long the identity stays cached
+
+
+async def _resolve_user(credentials: HTTPAuthorizationCredentials) -> CurrentUserCtx:
+    """Resolve the bearer token to an active user identity."""
     token = credentials.credentials
     
+    # Recently resolved tokens skip the JWT decode and the users SELECT
+    key = token_digest(token)
+    ctx = user_ctx_cache.get(key)
+    if ctx is not None:
+        return ctx
+    
     payload = verify_token(token)
     if not payload or payload.get("type") != "access":
         raise HTTPException(
@@ -30,8 +119,7 @@ async def get_current_user(
             detail="Invalid authentication credentials",
         )
     
-    result = await db.execute(select(User).where(User.id == int(user_id)))
-    user = result.scalar_one_or_none()
+    user = await user_loader.load(int(user_id))
     
     if not user:
         raise HTTPException(
@@ -45,21 +133,42 @@ async def get_current_user(
             detail="Inactive user",
         )
     
-    return user
+    exp = payload.get("exp")
+    ctx = CurrentUserCtx(id=user.id, role=user.role, is_active=user.is_active, exp=exp)
+    # Tokens without an exp claim are not cached
+    if exp is not None:
+        user_ctx_cache[key] = ctx
+    return ctx
 
-async def get_current_active_user(
-    current_user: User = Depends(get_current_user),
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> CurrentUserCtx:
+    """Get current authenticated user."""
+    return await _resolve_user(credentials)
+
+async def get_current_user_db(
+    current_user: CurrentUserCtx = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
 ) -> User:
-    """Get current active user."""
-    if not current_user.is_active:
-        raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
+    """Get current user as an ORM instance, for handlers that need the full row."""
+    user = await UserCRUD.get_by_id(db, current_user.id)
+    
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+        )
+    return user
+
+# Inactive users are already rejected while resolving the token
+get_current_active_user = get_current_user
 
 async def get_current_admin(
-    current_user: User = Depends(get_current_user),
-) -> User:
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> CurrentUserCtx:
     """Get current user if they are admin."""
-    if current_user.role not in [UserRole.ADMIN, UserRole.SUPER_ADMIN]:
+    current_user = await _resolve_user(credentials)
+    if current_user.role.rank < UserRole.ADMIN.rank:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions",
@@ -67,12 +176,13 @@ async def get_current_admin(
     return current_user
 
 async def get_current_super_admin(
-    current_user: User = Depends(get_current_user),
-) -> User:
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> CurrentUserCtx:
     """Get current user if they are super admin."""
-    if current_user.role != UserRole.SUPER_ADMIN:
+    current_user = await _resolve_user(credentials)
+    if current_user.role.rank < UserRole.SUPER_ADMIN.rank:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions",
         )
-    return current_user
\ No newline at end of file
+    return current_user
@@ -1,41 +1,67 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.db.database import engine, Base
 from app.models.user import User, UserRole
 from app.core.config import settings
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash_async, shutdown_hash_pool
 from app.api.api_v1.api import api_router
+import asyncio
 import logging
+import multiprocessing
+import os
+import time
+from pathlib import Path
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
 from fastapi.staticfiles import StaticFiles
+from app.core.images import image_processor
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Repository-root alembic.ini, found relative to this file so the working directory does not matter
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+
+def _upgrade_schema(connection) -> None:
+    """Apply pending Alembic revisions on an already open (sync) connection."""
+    config = Config(str(ALEMBIC_INI))
+    config.attributes["connection"] = connection
+    command.upgrade(config, "head")
+
+
 async def create_admin_user():
     """Create admin user on startup if not exists."""
-    from sqlalchemy.ext.asyncio import AsyncSession
-    from sqlalchemy import select
-
-    async with AsyncSession(engine) as session:
-        # Check if admin exists
-        result = await session.execute(select(User).where(User.email == settings.ADMIN_EMAIL))
-        admin = result.scalar_one_or_none()
+    async with engine.begin() as conn:
+        # Existing admin: skip the (deliberately slow) password hash entirely
+        exists = await conn.scalar(select(1).where(User.email == settings.ADMIN_EMAIL).limit(1))
+        if exists:
+            logger.info(f"Admin user already exists: {settings.ADMIN_EMAIL}")
+            return
 
-        if not admin:
-            # Create admin user
-            admin_user = User(
+        # ON CONFLICT settles races with other workers booting at the same time
+        result = await conn.execute(
+            pg_insert(User)
+            .values(
                 email=settings.ADMIN_EMAIL,
                 username=settings.ADMIN_USERNAME,
                 full_name=settings.ADMIN_FULL_NAME,
-                hashed_password=get_password_hash(settings.ADMIN_PASSWORD),
+                hashed_password=await get_password_hash_async(settings.ADMIN_PASSWORD),
                 role=UserRole.SUPER_ADMIN,
                 is_active=True,
                 is_verified=True,
             )
-            session.add(admin_user)
-            await session.commit()
+            .on_conflict_do_nothing()
+            .returning(User.id)
+        )
+        if result.scalar_one_or_none() is not None:
             logger.info(f"Admin user created: {settings.ADMIN_EMAIL}")
         else:
             logger.info(f"Admin user already exists: {settings.ADMIN_EMAIL}")
@@ -47,22 +73,38 @@ async def lifespan(app: FastAPI):
     logger.info("Starting up...")
 
     try:
-        # Create database tables
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
-        logger.info("Database tables created successfully")
+        # Schema setup introspects the catalog; with several workers only one should do it
+        if settings.RUN_MIGRATIONS:
+            async with engine.begin() as conn:
+                # Required by the trigram index on users
+                await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                await conn.run_sync(Base.metadata.create_all)
+                # create_all never alters existing tables; revisions bring older databases up to date
+                await conn.run_sync(_upgrade_schema)
+            logger.info("Database tables created and migrated successfully")
 
-        # Create admin user
-        await create_admin_user()
+            # Create admin user
+            await create_admin_user()
 
     except Exception as e:
         logger.error(f"Startup error: {e}")
         raise
 
+    # Image encoding runs in separate processes so it never starves the event loop;
+    # spawn avoids forking a process that already has running threads
+    app.state.encode_pool = ProcessPoolExecutor(
+        max_workers=os.cpu_count(),
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+    image_processor.executor = app.state.encode_pool
+
     yield
 
     # Shutdown
     logger.info("Shutting down...")
+    image_processor.executor = None
+    app.state.encode_pool.shutdown(wait=True, cancel_futures=True)
+    shutdown_hash_pool()
     await engine.dispose()
 
 
@@ -73,6 +115,7 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Add to your FastAPI app initialization
@@ -102,19 +145,40 @@ async def root():
     }
 
 
+# Last database probe as (checked_at, error); probes hit the pool at most once per interval
+HEALTH_CHECK_INTERVAL = 5  # seconds
+_db_health: tuple = (float("-inf"), None)
+_db_health_lock = asyncio.Lock()
+
+
+async def _check_database() -> Optional[str]:
+    """Return the last probe's error (None if healthy), re-probing once it is stale."""
+    global _db_health
+    async with _db_health_lock:
+        checked_at, error = _db_health
+        now = time.monotonic()
+        if now - checked_at >= HEALTH_CHECK_INTERVAL:
+            try:
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+                error = None
+            except Exception as e:
+                error = str(e)
+            _db_health = (now, error)
+        return error
+
+
 @app.get("/health")
 async def health_check():
-    try:
-        async with engine.connect() as conn:
-            await conn.execute("SELECT 1")
-            return {
-                "status": "healthy",
-                "database": "connected",
-                "version": settings.VERSION,
-            }
-    except Exception as e:
+    error = await _check_database()
+    if error is None:
         return {
-            "status": "unhealthy",
-            "database": "disconnected",
-            "error": str(e),
+            "status": "healthy",
+            "database": "connected",
+            "version": settings.VERSION,
         }
+    return {
+        "status": "unhealthy",
+        "database": "disconnected",
+        "error": error,
+    }
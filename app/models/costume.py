@@ -1,16 +1,16 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, Text, Enum, DateTime
-from sqlalchemy.dialects.postgresql import ARRAY, JSON
-from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Float, Boolean, Text, Enum, DateTime, Computed, Index
+from sqlalchemy.dialects.postgresql import ARRAY, JSON, TSVECTOR
+from sqlalchemy.orm import deferred
 import enum
 from app.db.database import Base
 from sqlalchemy.sql import func
 
-class Gender(str, enum.Enum):
+class Gender(enum.StrEnum):
     MALE = "male"
     FEMALE = "female"
     UNISEX = "unisex"
 
-class AgeCategory(str, enum.Enum):
+class AgeCategory(enum.StrEnum):
     CHILD = "child"  # 3-12 лет
     TEEN = "teen"    # 13-17 лет
     ADULT = "adult"  # 18+ лет
@@ -41,10 +41,35 @@ class Costume(Base):
     items = Column(Text, nullable=True)
     related_costumes = Column(ARRAY(Integer), nullable=False, default=[])
     
-    # Timestamps - use timezone-naive datetime
-    created_at = Column(DateTime(timezone=False), default=func.now(), nullable=False)
-    updated_at = Column(DateTime(timezone=False), default=func.now(), onupdate=func.now(), nullable=False)
+    # Timestamps - use timezone-naive datetime, set by Postgres
+    created_at = Column(DateTime(timezone=False), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=False), server_default=func.now(), onupdate=func.now(), nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
     
+    # Full-text search document, maintained by Postgres; deferred so normal loads skip it,
+    # and reading it off an instance raises instead of issuing one SELECT per row
+    search_tsv = deferred(
+        Column(
+            TSVECTOR,
+            Computed(
+                "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, '') || ' ' || coalesce(items, ''))",
+                persisted=True,
+            ),
+        ),
+        raiseload=True,
+    )
+    
+    __table_args__ = (
+        Index("ix_costumes_search_tsv", "search_tsv", postgresql_using="gin"),
+        Index("ix_costumes_tags", "tags", postgresql_using="gin"),
+        # Keyset pagination order (created_at DESC, id DESC), scanned backwards
+        Index("ix_costumes_created_id", "created_at", "id"),
+        # Public list (is_active = true, same order); INCLUDE lets most list columns come from the index
+        Index(
+            "ix_costumes_active_created_id", "is_active", "created_at", "id",
+            postgresql_include=["name", "price", "gender", "age_category", "tags"],
+        ),
+    )
+    
     def __repr__(self):
         return f"<Costume {self.name} ({self.amount} pcs)>"
\ No newline at end of file
@@ -1,14 +1,35 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Enum
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, Boolean, Index, TypeDecorator
 from sqlalchemy.sql import func
-from datetime import datetime, timezone
 import enum
 from app.db.database import Base
 
 
 class UserRole(str, enum.Enum):
-    USER = "user"
-    ADMIN = "admin"
-    SUPER_ADMIN = "super_admin"
+    """Role exposed by name in the API; stored as its rank, which orders the hierarchy."""
+    USER = "user", 0
+    ADMIN = "admin", 1
+    SUPER_ADMIN = "super_admin", 2
+
+    def __new__(cls, value: str, rank: int):
+        member = str.__new__(cls, value)
+        member._value_ = value
+        member.rank = rank
+        return member
+
+
+_ROLES_BY_RANK = {role.rank: role for role in UserRole}
+
+
+class RoleRank(TypeDecorator):
+    """UserRole stored as a SMALLINT rank instead of a Postgres ENUM."""
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else UserRole(value).rank
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else _ROLES_BY_RANK[value]
 
 
 class User(Base):
@@ -19,11 +40,25 @@ class User(Base):
     username = Column(String, unique=True, index=True, nullable=False)
     full_name = Column(String, nullable=True)
     hashed_password = Column(String, nullable=False)
-    role = Column(Enum(UserRole), default=UserRole.USER, nullable=False)
+    role = Column(RoleRank, default=UserRole.USER, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
     is_verified = Column(Boolean, default=False, nullable=False)
-    created_at = Column(DateTime, default=func.now(), nullable=False)
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    # Set by Postgres, so inserts never build a timestamp in Python
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     def __repr__(self):
         return f"<User {self.email} ({self.role.value})>"
+
+
+# Text matched by user search; must stay identical to the trigram index expression
+user_search_text = (
+    User.email + " " + User.username + " " + func.coalesce(User.full_name, "")
+)
+
+Index(
+    "ix_users_search_trgm",
+    user_search_text.label("search_text"),
+    postgresql_using="gin",
+    postgresql_ops={"search_text": "gin_trgm_ops"},
+)
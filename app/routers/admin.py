@@ -2,17 +2,18 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.db.database import get_db
-from app.schemas.user import UserResponse, AdminUserUpdate, UserCreateAdmin
+from app.schemas.user import UserResponse, AdminUserUpdate, UserCreateAdmin, UserIds, BulkUserResult
 from app.crud.user import UserCRUD
-from app.dependencies.auth import get_current_admin, get_current_super_admin
+from app.dependencies.auth import CurrentUserCtx, get_current_admin, get_current_super_admin
 from app.models.user import User, UserRole
+from app.core.cache import invalidate_user, invalidate_users
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 @router.post("/users", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def create_user_admin(
     user_data: UserCreateAdmin,
-    current_user: User = Depends(get_current_admin),
+    current_user: CurrentUserCtx = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
     """Create user as admin."""
@@ -30,7 +31,7 @@ async def create_user_admin(
 async def update_user_admin(
     user_id: int,
     user_data: AdminUserUpdate,
-    current_user: User = Depends(get_current_admin),
+    current_user: CurrentUserCtx = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
     """Update user as admin."""
@@ -40,7 +41,7 @@ async def update_user_admin(
 @router.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user_admin(
     user_id: int,
-    current_user: User = Depends(get_current_admin),
+    current_user: CurrentUserCtx = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
     """Delete user as admin."""
@@ -67,13 +68,14 @@ async def delete_user_admin(
     
     await db.delete(user)
     await db.commit()
+    invalidate_user(user_id)
     return None
 
 @router.put("/users/{user_id}/role", response_model=UserResponse)
 async def change_user_role(
     user_id: int,
     role: UserRole,
-    current_user: User = Depends(get_current_admin),
+    current_user: CurrentUserCtx = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
     """Change user role."""
@@ -83,63 +85,126 @@ async def change_user_role(
 @router.put("/users/{user_id}/activate", response_model=UserResponse)
 async def activate_user(
     user_id: int,
-    current_user: User = Depends(get_current_admin),
+    current_user: CurrentUserCtx = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
     """Activate user."""
-    user = await UserCRUD.get_by_id(db, user_id)
+    user = await UserCRUD.update_fields(db, user_id, is_active=True)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found",
         )
     
-    user.is_active = True
     await db.commit()
-    await db.refresh(user)
+    invalidate_user(user_id)
     return user
 
 @router.put("/users/{user_id}/deactivate", response_model=UserResponse)
 async def deactivate_user(
     user_id: int,
-    current_user: User = Depends(get_current_admin),
+    current_user: CurrentUserCtx = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
     """Deactivate user."""
-    user = await UserCRUD.get_by_id(db, user_id)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found",
-        )
-    
     # Cannot deactivate self
-    if user.id == current_user.id:
+    if user_id == current_user.id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot deactivate yourself",
         )
     
-    user.is_active = False
+    user = await UserCRUD.update_fields(db, user_id, is_active=False)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+    
     await db.commit()
-    await db.refresh(user)
+    invalidate_user(user_id)
     return user
 
 @router.put("/users/{user_id}/verify", response_model=UserResponse)
 async def verify_user(
     user_id: int,
-    current_user: User = Depends(get_current_admin),
+    current_user: CurrentUserCtx = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
     """Verify user email."""
-    user = await UserCRUD.get_by_id(db, user_id)
+    user = await UserCRUD.update_fields(db, user_id, is_verified=True)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found",
         )
     
-    user.is_verified = True
     await db.commit()
-    await db.refresh(user)
-    return user
\ No newline at end of file
+    return user
+
+# Bulk operations: one statement for the whole id list instead of a request per user
+
+@router.post("/users/bulk/activate", response_model=BulkUserResult)
+async def bulk_activate_users(
+    user_ids: UserIds,
+    current_user: CurrentUserCtx = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Activate several users."""
+    ids = await UserCRUD.bulk_update_fields(db, user_ids.ids, is_active=True)
+    await db.commit()
+    invalidate_users(ids)
+    return BulkUserResult(ids=ids)
+
+@router.post("/users/bulk/deactivate", response_model=BulkUserResult)
+async def bulk_deactivate_users(
+    user_ids: UserIds,
+    current_user: CurrentUserCtx = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Deactivate several users."""
+    # Cannot deactivate self
+    if current_user.id in user_ids.ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot deactivate yourself",
+        )
+    
+    ids = await UserCRUD.bulk_update_fields(db, user_ids.ids, is_active=False)
+    await db.commit()
+    invalidate_users(ids)
+    return BulkUserResult(ids=ids)
+
+@router.post("/users/bulk/verify", response_model=BulkUserResult)
+async def bulk_verify_users(
+    user_ids: UserIds,
+    current_user: CurrentUserCtx = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Verify several users' emails."""
+    ids = await UserCRUD.bulk_update_fields(db, user_ids.ids, is_verified=True)
+    await db.commit()
+    return BulkUserResult(ids=ids)
+
+@router.post("/users/bulk/delete", response_model=BulkUserResult)
+async def bulk_delete_users(
+    user_ids: UserIds,
+    current_user: CurrentUserCtx = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Delete several users; super admins are skipped unless the caller is one."""
+    # Cannot delete self
+    if current_user.id in user_ids.ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot delete yourself",
+        )
+    
+    criteria = []
+    if current_user.role != UserRole.SUPER_ADMIN:
+        criteria.append(User.role != UserRole.SUPER_ADMIN)
+    
+    ids = await UserCRUD.bulk_delete(db, user_ids.ids, *criteria)
+    await db.commit()
+    invalidate_users(ids)
+    return BulkUserResult(ids=ids)
@@ -1,38 +1,82 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Form, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Form, File, UploadFile, Response
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-import json
+import orjson
 from app.db.database import get_db
-from app.schemas.costume import CostumeCreate, CostumeUpdate, CostumeResponse
+from app.schemas.costume import CostumeCreate, CostumeUpdate, CostumeResponse, GenderEnum, AgeCategoryEnum, split_tags
 from app.crud.costume import CostumeCRUD
-from app.dependencies.auth import get_current_admin
-from app.models.user import User
+from app.dependencies.auth import CurrentUserCtx, get_current_admin
 
 router = APIRouter(prefix="/admin/costumes", tags=["admin-costumes"])
 
 
+def _parse_tag_list(raw: Optional[str]) -> List[str]:
+    """Parse a tags form field given as a JSON array/value or a comma-separated string."""
+    if not raw or not raw.strip():
+        return []
+    try:
+        # Try to parse as JSON first
+        tags = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        # If not JSON, treat as comma-separated string
+        return split_tags(raw)
+    # Arrays are the common case; type() is skips isinstance's subclass check
+    return tags if type(tags) is list else [tags]
+
+
+def _parse_id_list(raw: Optional[str]) -> List[int]:
+    """Parse an id list form field given as a JSON array/value or comma-separated ids."""
+    if not raw or not raw.strip():
+        return []
+    try:
+        ids = orjson.loads(raw)
+        if type(ids) is list:
+            return ids
+        return [int(ids)] if ids else []
+    except ValueError:  # orjson.JSONDecodeError is a ValueError
+        # If not JSON, treat as comma-separated IDs; invalid entries are skipped
+        ids = []
+        for item in raw.split(","):
+            # int() strips surrounding whitespace itself; blank items fail like any other invalid one
+            try:
+                ids.append(int(item))
+            except ValueError:
+                pass
+        return ids
+
+
+# Built once at import: validating and serializing a whole page is then one Rust call each
+_COSTUME_LIST_TA = TypeAdapter(List[CostumeResponse])
+
+
+def _costumes_response(costumes, headers: Optional[dict] = None) -> Response:
+    """Serialize ORM rows straight to JSON; returning a Response skips FastAPI's own pass."""
+    body = _COSTUME_LIST_TA.dump_json(_COSTUME_LIST_TA.validate_python(costumes, from_attributes=True))
+    return Response(body, media_type="application/json", headers=headers)
+
+
 @router.get("/", response_model=List[CostumeResponse])
 async def admin_get_costumes(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page; overrides skip"),
     is_active: Optional[bool] = None,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_admin),
+    current_user: CurrentUserCtx = Depends(get_current_admin),
 ):
     """Get all costumes (admin only, includes inactive)."""
-    filters = None
-    if is_active is not None:
-        from app.schemas.costume import CostumeFilter
-
-        filters = CostumeFilter(is_active=is_active)
-
-    costumes = await CostumeCRUD.get_multi(db, skip=skip, limit=limit, filters=filters)
-    return costumes
+    after = CostumeCRUD.decode_cursor(cursor) if cursor else None
+    costumes = await CostumeCRUD.get_multi(db, skip=skip, limit=limit, after=after, is_active=is_active)
+    headers = {}
+    if len(costumes) == limit:
+        headers["X-Next-Cursor"] = CostumeCRUD.encode_cursor(costumes[-1])
+    return _costumes_response(costumes, headers)
 
 
 @router.get("/{costume_id}", response_model=CostumeResponse)
 async def admin_get_costume(
-    costume_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_admin)
+    costume_id: int, db: AsyncSession = Depends(get_db), current_user: CurrentUserCtx = Depends(get_current_admin)
 ):
     """Get costume by ID (admin only)."""
     costume = await CostumeCRUD.get_by_id(db, costume_id)
@@ -50,56 +94,27 @@ async def create_costume(
     description: Optional[str] = Form(None),
     amount: int = Form(1),
     price: Optional[float] = Form(None),
-    gender: str = Form("unisex"),
-    age_category: str = Form("universal"),
+    gender: GenderEnum = Form(GenderEnum.UNISEX),
+    age_category: AgeCategoryEnum = Form(AgeCategoryEnum.UNIVERSAL),
     size: Optional[str] = Form(None),
     tags: str = Form("[]"),  # Accept as string, will parse as JSON
     items: Optional[str] = Form(None),
     related_costumes: str = Form("[]"),  # Accept as string, will parse as JSON
     images: Optional[List[UploadFile]] = File(None),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_admin),
+    current_user: CurrentUserCtx = Depends(get_current_admin),
 ):
     """Create a new costume."""
     try:
-        # Parse tags - handle both JSON array and comma-separated string
-        tags_list = []
-        if tags and tags.strip():
-            try:
-                # Try to parse as JSON first
-                tags_list = json.loads(tags)
-                if not isinstance(tags_list, list):
-                    tags_list = [tags_list]
-            except json.JSONDecodeError:
-                # If not JSON, treat as comma-separated string
-                tags_list = [tag.strip() for tag in tags.split(",") if tag.strip()]
-
-        # Parse related costumes
-        related_list = []
-        if related_costumes and related_costumes.strip():
-            try:
-                related_list = json.loads(related_costumes)
-                if not isinstance(related_list, list):
-                    related_list = [int(related_list)] if related_list else []
-            except (json.JSONDecodeError, ValueError):
-                # If not JSON, treat as comma-separated IDs
-                related_list = []
-                for item in related_costumes.split(","):
-                    if item.strip():
-                        try:
-                            related_list.append(int(item.strip()))
-                        except ValueError:
-                            pass
-
-        # Handle price - convert empty string to None
-        price_value = float(price) if price and str(price).strip() else None
+        tags_list = _parse_tag_list(tags)
+        related_list = _parse_id_list(related_costumes)
 
         # Create costume data
         costume_data = CostumeCreate(
             name=name,
             description=description if description and description.strip() else None,
             amount=amount,
-            price=price_value,
+            price=price,
             gender=gender,
             age_category=age_category,
             size=size if size and size.strip() else None,
@@ -123,15 +138,15 @@ async def update_costume(
     description: Optional[str] = Form(None),
     amount: Optional[int] = Form(None),
     price: Optional[float] = Form(None),
-    gender: Optional[str] = Form(None),
-    age_category: Optional[str] = Form(None),
+    gender: Optional[GenderEnum] = Form(None),
+    age_category: Optional[AgeCategoryEnum] = Form(None),
     size: Optional[str] = Form(None),
     tags: Optional[str] = Form(None),
     items: Optional[str] = Form(None),
     related_costumes: Optional[str] = Form(None),
     is_active: Optional[bool] = Form(None),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_admin),
+    current_user: CurrentUserCtx = Depends(get_current_admin),
 ):
     """Update a costume."""
     try:
@@ -145,7 +160,7 @@ async def update_costume(
         if amount is not None:
             update_data["amount"] = amount
         if price is not None:
-            update_data["price"] = float(price) if str(price).strip() else None
+            update_data["price"] = price
         if gender is not None:
             update_data["gender"] = gender
         if age_category is not None:
@@ -157,35 +172,10 @@ async def update_costume(
         if is_active is not None:
             update_data["is_active"] = is_active
 
-        # Parse tags if provided
         if tags is not None:
-            tags_list = []
-            if tags.strip():
-                try:
-                    tags_list = json.loads(tags)
-                    if not isinstance(tags_list, list):
-                        tags_list = [tags_list]
-                except json.JSONDecodeError:
-                    tags_list = [tag.strip() for tag in tags.split(",") if tag.strip()]
-            update_data["tags"] = tags_list
-
-        # Parse related costumes if provided
+            update_data["tags"] = _parse_tag_list(tags)
         if related_costumes is not None:
-            related_list = []
-            if related_costumes.strip():
-                try:
-                    related_list = json.loads(related_costumes)
-                    if not isinstance(related_list, list):
-                        related_list = [int(related_list)] if related_list else []
-                except (json.JSONDecodeError, ValueError):
-                    related_list = []
-                    for item in related_costumes.split(","):
-                        if item.strip():
-                            try:
-                                related_list.append(int(item.strip()))
-                            except ValueError:
-                                pass
-            update_data["related_costumes"] = related_list
+            update_data["related_costumes"] = _parse_id_list(related_costumes)
 
         # Update costume
         costume_update = CostumeUpdate(**update_data)
@@ -199,7 +189,7 @@ async def update_costume(
 
 @router.delete("/{costume_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_costume(
-    costume_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_admin)
+    costume_id: int, db: AsyncSession = Depends(get_db), current_user: CurrentUserCtx = Depends(get_current_admin)
 ):
     """Delete a costume (admin only)."""
     await CostumeCRUD.delete(db, costume_id)
@@ -211,7 +201,7 @@ async def update_costume_amount(
     costume_id: int,
     delta: int = Form(..., description="Positive to add, negative to subtract"),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_admin),
+    current_user: CurrentUserCtx = Depends(get_current_admin),
 ):
     """Update costume amount (inventory management)."""
     costume = await CostumeCRUD.update_amount(db, costume_id, delta)
@@ -224,8 +214,8 @@ async def admin_search_costumes(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_admin),
+    current_user: CurrentUserCtx = Depends(get_current_admin),
 ):
     """Search all costumes (admin only)."""
     costumes = await CostumeCRUD.search(db, query=q, skip=skip, limit=limit)
-    return costumes
+    return _costumes_response(costumes)
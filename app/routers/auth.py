@@ -1,16 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBearer
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 from app.db.database import get_db
-from app.schemas.user import LoginRequest, LoginResponse, UserCreate, UserWithToken
+from app.schemas.user import LoginRequest, LoginResponse, UserCreate, UserResponse, UserWithToken
 from app.schemas.token import RefreshTokenRequest, Token
 from app.crud.user import UserCRUD
-from app.core.security import create_access_token, create_refresh_token, verify_token
+from app.core.security import create_access_token, create_refresh_token, create_token_pair, verify_token, forget_token
 from app.models.user import User
-from app.dependencies.auth import get_current_user
+from app.dependencies.auth import get_current_user_db
+from app.core.cache import invalidate_token
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
-security = HTTPBearer()
+security = HTTPBearer(auto_error=False)
+
+# Columns copied into UserWithToken; reading them directly skips copying SQLAlchemy state
+_USER_FIELDS = tuple(UserResponse.model_fields)
+
+
+def _user_fields(user: User) -> dict:
+    return {field: getattr(user, field) for field in _USER_FIELDS}
+
 
 @router.post("/register", response_model=UserWithToken, status_code=status.HTTP_201_CREATED)
 async def register(
@@ -23,8 +33,8 @@ async def register(
     access_token = create_access_token(subject=user.id)
     refresh_token = create_refresh_token(subject=user.id)
     
-    return UserWithToken(
-        **user.__dict__,
+    return UserWithToken.model_construct(
+        **_user_fields(user),
         access_token=access_token,
         refresh_token=refresh_token,
         token_type="bearer"
@@ -78,8 +88,7 @@ async def refresh_token(
             detail="User not found or inactive",
         )
     
-    new_access_token = create_access_token(subject=user.id)
-    new_refresh_token = create_refresh_token(subject=user.id)
+    new_access_token, new_refresh_token = create_token_pair(user.id)
     
     return Token(
         access_token=new_access_token,
@@ -89,20 +98,24 @@ async def refresh_token(
 
 @router.get("/me", response_model=UserWithToken)
 async def get_me(
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user_db)
 ):
     """Get current user info."""
-    access_token = create_access_token(subject=current_user.id)
-    refresh_token = create_refresh_token(subject=current_user.id)
+    access_token, refresh_token = create_token_pair(current_user.id)
     
-    return UserWithToken(
-        **current_user.__dict__,
+    return UserWithToken.model_construct(
+        **_user_fields(current_user),
         access_token=access_token,
         refresh_token=refresh_token,
         token_type="bearer"
     )
 
 @router.post("/logout")
-async def logout():
+async def logout(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
+):
     """Logout user (client should discard tokens)."""
+    if credentials:
+        invalidate_token(credentials.credentials)
+        forget_token(credentials.credentials)
     return {"message": "Successfully logged out"}
\ No newline at end of file
@@ -1,18 +1,101 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import orjson
 from app.db.database import get_db
-from app.schemas.costume import CostumePublic, CostumeList, CostumeFilter
+from app.schemas.costume import CostumePublic, CostumeList, CostumeSummary, CostumeFilter, GenderEnum, AgeCategoryEnum, split_tags
 from app.crud.costume import CostumeCRUD
+from app.core.cache import cache_costume_list, costume_list_cache, costume_detail_cache
+from app.core.images import image_processor
+from app.core.config import settings
+
+router = APIRouter(prefix="/costumes", tags=["costumes"], default_response_class=ORJSONResponse)
+
+# Public GETs change only on admin writes, so shared caches may hold them briefly
+_CACHE_CONTROL = (
+    f"public, max-age={settings.PUBLIC_CACHE_MAX_AGE}, "
+    f"stale-while-revalidate={settings.PUBLIC_CACHE_STALE}"
+)
+
+# Stored image strings with these prefixes are already usable URLs
+_KEPT_URL_PREFIXES = ("/", "http")
+
+
+def _extract_urls(images: list) -> List[str]:
+    """Extract image URLs from a costume's images JSON."""
+    image_urls = []
+    append = image_urls.append
+    for img_data in images:
+        # If it's a dict (JSON object), extract the URL
+        if isinstance(img_data, dict):
+            # Check for different possible field names
+            if "original" in img_data:
+                append(img_data["original"])
+            elif "original_path" in img_data:
+                # Construct full URL from path
+                append(f"/uploads/{img_data['original_path']}")
+            elif "url" in img_data:
+                append(img_data["url"])
+        # If it's already a string (URL), use it directly
+        elif isinstance(img_data, str):
+            # Relative paths (e.g. "uploads/...") are made absolute; absolute paths,
+            # http(s) URLs and bare names are kept as they are
+            if img_data.startswith(_KEPT_URL_PREFIXES) or "/" not in img_data:
+                append(img_data)
+            else:
+                append(f"/{img_data}")
+    return image_urls
+
+
+def _render(content, headers: Optional[Dict[str, str]] = None) -> Tuple[bytes, Dict[str, str]]:
+    """Serialize a response body once, with its headers, a weak ETag derived from the body and Cache-Control."""
+    body = orjson.dumps(content)
+    etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    return body, {**(headers or {}), "ETag": etag, "Cache-Control": _CACHE_CONTROL}
+
+
+def _etag_response(request: Request, body: bytes, headers: Dict[str, str]) -> Response:
+    """Send a rendered body, or an empty 304 if the client already holds it."""
+    etag = headers["ETag"]
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in (t.strip() for t in if_none_match.split(","))):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _thumb_from_image(img_data: dict) -> Optional[str]:
+    """Thumbnail URL for a stored image, without formatting the whole costume."""
+    return image_processor.get_thumbnail_url(img_data['hash'], img_data['original_name'])
+
+
+def _summaries(costumes) -> List[dict]:
+    """Search/related list items, built straight into dicts that orjson serializes as is."""
+    return [
+        {
+            "id": costume.id,
+            "name": costume.name,
+            "price": costume.price,
+            "gender": costume.gender,
+            "age_category": costume.age_category,
+            "tags": costume.tags,
+            "thumbnail": _thumb_from_image(costume.images[0]) if costume.images else None,
+            "is_active": costume.is_active
+        }
+        for costume in costumes
+    ]
+
 
-router = APIRouter(prefix="/costumes", tags=["costumes"])
 @router.get("/", response_model=List[CostumeList])
 async def get_costumes(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page; overrides skip"),
     name: Optional[str] = None,
-    gender: Optional[str] = None,
-    age_category: Optional[str] = None,
+    gender: Optional[GenderEnum] = None,
+    age_category: Optional[AgeCategoryEnum] = None,
     size: Optional[str] = None,
     tags: Optional[str] = None,  # Comma-separated tags
     min_price: Optional[float] = Query(None, ge=0),
@@ -24,7 +107,18 @@ async def get_costumes(
     # Parse tags if provided
     tag_list = None
     if tags:
-        tag_list = [tag.strip() for tag in tags.split(",") if tag.strip()]
+        tag_list = split_tags(tags)
+    
+    # Normalize so equivalent queries share one entry: name matches case-insensitively,
+    # tags match as a set, and skip is ignored when a cursor is given
+    cache_key = (
+        name.lower() if name else None, gender, age_category, size,
+        tuple(sorted(set(tag_list))) if tag_list else None,
+        min_price, max_price, min_amount, 0 if cursor else skip, limit, cursor,
+    )
+    cached = costume_list_cache.get(cache_key)
+    if cached is not None:
+        return _etag_response(request, *cached)
     
     # Create filter
     filters = CostumeFilter(
@@ -39,48 +133,37 @@ async def get_costumes(
         is_active=True  # Only show active costumes to public
     )
     
-    costumes = await CostumeCRUD.get_multi(db, skip=skip, limit=limit, filters=filters)
+    after = CostumeCRUD.decode_cursor(cursor) if cursor else None
+    # Narrow rows rather than ORM objects: no unused columns, no identity-map bookkeeping
+    costumes = await CostumeCRUD.get_multi_list(db, skip=skip, limit=limit, filters=filters, after=after)
     
     result = []
+    append = result.append
     for costume in costumes:
-        # Extract image URLs from JSON
-        image_urls = []
-        if costume.images:
-            for img_data in costume.images:
-                # If it's a dict (JSON object), extract the URL
-                if isinstance(img_data, dict):
-                    # Check for different possible field names
-                    if "original" in img_data:
-                        image_urls.append(img_data["original"])
-                    elif "original_path" in img_data:
-                        # Construct full URL from path
-                        image_urls.append(f"/uploads/{img_data['original_path']}")
-                    elif "url" in img_data:
-                        image_urls.append(img_data["url"])
-                # If it's already a string (URL), use it directly
-                elif isinstance(img_data, str):
-                    # If it's a relative path, make it absolute
-                    if img_data.startswith("uploads/") or ("/" in img_data and not img_data.startswith("http")):
-                        image_urls.append(f"/{img_data}" if not img_data.startswith("/") else img_data)
-                    else:
-                        image_urls.append(img_data)
-                
-        result.append({
+        images = costume.images
+        image_urls = _extract_urls(images) if images else []
+        append({
             "id": costume.id,
             "name": costume.name,
             "price": costume.price,
-            "gender": costume.gender.value,
-            "age_category": costume.age_category.value,
+            "gender": costume.gender,
+            "age_category": costume.age_category,
             "tags": costume.tags,
-            "thumbnail": image_urls[0],  # Full URL to thumbnail
+            "thumbnail": image_urls[0] if image_urls else None,  # Full URL to thumbnail
             "images": image_urls,   # Base data for all images
             "is_active": costume.is_active
         })
     
-    return result
+    headers = {}
+    if len(costumes) == limit:
+        headers["X-Next-Cursor"] = CostumeCRUD.encode_cursor(costumes[-1])
+    cached = _render(result, headers)
+    cache_costume_list(cache_key, cached)
+    return _etag_response(request, *cached)
 
-@router.get("/search", response_model=List[CostumeList])
+@router.get("/search", response_model=List[CostumeSummary])
 async def search_costumes(
+    request: Request,
     q: str = Query(..., min_length=1, description="Search query"),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
@@ -89,86 +172,38 @@ async def search_costumes(
     """Search costumes by name, description, or tags."""
     costumes = await CostumeCRUD.search(db, query=q, skip=skip, limit=limit)
     
-    result = []
-    for costume in costumes:
-        thumbnail_url = None
-        if costume.images:
-            first_img = costume.images[0]
-            urls = CostumeCRUD.format_for_public(costume)["images"][0]
-            if "variants" in urls and "thumb" in urls["variants"]:
-                thumb_variants = urls["variants"]["thumb"]
-                thumbnail_url = (
-                    thumb_variants.get("webp") or 
-                    thumb_variants.get("avif") or 
-                    thumb_variants.get("jpg")
-                )
-        
-        result.append({
-            "id": costume.id,
-            "name": costume.name,
-            "price": costume.price,
-            "gender": costume.gender.value,
-            "age_category": costume.age_category.value,
-            "tags": costume.tags,
-            "thumbnail": thumbnail_url,
-            "is_active": costume.is_active
-        })
-    
-    return result
+    return _etag_response(request, *_render(_summaries(costumes)))
 
 @router.get("/{costume_id}", response_model=CostumePublic)
 async def get_costume(
+    request: Request,
     costume_id: int,
     db: AsyncSession = Depends(get_db)
 ):
     """Get costume details by ID (public access)."""
-    costume = await CostumeCRUD.get_by_id(db, costume_id)
+    cached = costume_detail_cache.get(costume_id)
+    if cached is not None:
+        return _etag_response(request, *cached)
     
-    if not costume:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Costume not found",
-        )
+    # Missing and inactive costumes are the same 404
+    costume = await CostumeCRUD.get_active_by_id(db, costume_id)
     
-    if not costume.is_active:
+    if not costume:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Costume not found",
         )
     
-    return CostumeCRUD.format_for_public(costume)
+    cached = costume_detail_cache[costume_id] = _render(CostumeCRUD.format_for_public(costume))
+    return _etag_response(request, *cached)
 
-@router.get("/{costume_id}/related", response_model=List[CostumeList])
+@router.get("/{costume_id}/related", response_model=List[CostumeSummary])
 async def get_related_costumes(
+    request: Request,
     costume_id: int,
     db: AsyncSession = Depends(get_db)
 ):
     """Get related costumes for a costume."""
     related = await CostumeCRUD.get_related_costumes(db, costume_id)
     
-    result = []
-    for costume in related:
-        thumbnail_url = None
-        if costume.images:
-            first_img = costume.images[0]
-            urls = CostumeCRUD.format_for_public(costume)["images"][0]
-            if "variants" in urls and "thumb" in urls["variants"]:
-                thumb_variants = urls["variants"]["thumb"]
-                thumbnail_url = (
-                    thumb_variants.get("webp") or 
-                    thumb_variants.get("avif") or 
-                    thumb_variants.get("jpg")
-                )
-        
-        result.append({
-            "id": costume.id,
-            "name": costume.name,
-            "price": costume.price,
-            "gender": costume.gender.value,
-            "age_category": costume.age_category.value,
-            "tags": costume.tags,
-            "thumbnail": thumbnail_url,
-            "is_active": costume.is_active
-        })
-    
-    return result
\ No newline at end of file
+    return _etag_response(request, *_render(_summaries(related)))
\ No newline at end of file
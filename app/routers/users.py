@@ -1,24 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.db.database import get_db
 from app.schemas.user import UserResponse, UserUpdate, UserCreate
 from app.crud.user import UserCRUD
-from app.dependencies.auth import get_current_user, get_current_admin
-from app.models.user import User
+from app.models.user import UserRole
+from app.dependencies.auth import CurrentUserCtx, get_current_user, get_current_admin
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get("/", response_model=List[UserResponse])
 async def get_users(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, description="X-Next-Cursor from the previous page; overrides skip"),
     active_only: bool = Query(False),
-    current_user: User = Depends(get_current_admin),
+    current_user: CurrentUserCtx = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
     """Get all users (admin only)."""
-    users = await UserCRUD.get_all(db, skip=skip, limit=limit, active_only=active_only)
+    users = await UserCRUD.get_all(
+        db, skip=skip, limit=limit, active_only=active_only, after_id=cursor
+    )
+    if len(users) == limit:
+        response.headers["X-Next-Cursor"] = str(users[-1].id)
     return users
 
 @router.get("/search", response_model=List[UserResponse])
@@ -26,7 +32,7 @@ async def search_users(
     query: str = Query(..., min_length=1),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
-    current_user: User = Depends(get_current_admin),
+    current_user: CurrentUserCtx = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
     """Search users (admin only)."""
@@ -36,11 +42,11 @@ async def search_users(
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUserCtx = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get user by ID."""
-    if current_user.id != user_id and current_user.role.value == "user":
+    if current_user.id != user_id and current_user.role.rank < UserRole.ADMIN.rank:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Cannot view other users",
@@ -59,7 +65,7 @@ async def get_user(
 async def update_user(
     user_id: int,
     user_data: UserUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUserCtx = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Update user."""
@@ -69,7 +75,7 @@ async def update_user(
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user(
     user_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUserCtx = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Delete user."""
@@ -1,16 +1,27 @@
+import re
+from dataclasses import dataclass
 from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime
-from enum import Enum
+from enum import StrEnum
 from app.models.costume import Gender, AgeCategory
 
+# Comma separator with its surrounding whitespace, so items need no strip()
+_TAG_SPLIT = re.compile(r"\s*,\s*")
+
+
+def split_tags(raw: str) -> List[str]:
+    """Split a comma-separated tag string, dropping empty items."""
+    return [tag for tag in _TAG_SPLIT.split(raw.strip()) if tag]
+
+
 # Enums for schemas
-class GenderEnum(str, Enum):
+class GenderEnum(StrEnum):
     MALE = "male"
     FEMALE = "female"
     UNISEX = "unisex"
 
-class AgeCategoryEnum(str, Enum):
+class AgeCategoryEnum(StrEnum):
     CHILD = "child"
     TEEN = "teen"
     ADULT = "adult"
@@ -155,8 +166,21 @@ class CostumeList(BaseModel):
     class Config:
         from_attributes = True
 
-# Query filters
-class CostumeFilter(BaseModel):
+class CostumeSummary(BaseModel):
+    """Search/related list item: CostumeList without the full image list"""
+    id: int
+    name: str
+    price: Optional[float]
+    gender: GenderEnum
+    age_category: AgeCategoryEnum
+    tags: List[str]
+    thumbnail: Optional[str]  # Full URL to thumbnail
+    is_active: bool
+
+# Query filters; internal only and built from already-validated query params,
+# so a plain dataclass instead of a BaseModel
+@dataclass(frozen=True, slots=True)
+class CostumeFilter:
     name: Optional[str] = None
     gender: Optional[GenderEnum] = None
     age_category: Optional[AgeCategoryEnum] = None
@@ -165,7 +189,4 @@ class CostumeFilter(BaseModel):
     min_price: Optional[float] = None
     max_price: Optional[float] = None
     min_amount: Optional[int] = None
-    is_active: Optional[bool] = True
-    
-    class Config:
-        extra = "forbid"
\ No newline at end of file
+    is_active: Optional[bool] = True
\ No newline at end of file
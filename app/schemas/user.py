@@ -1,9 +1,27 @@
-from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
-from typing import Optional
+import re
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator, model_validator
+from typing import List, Optional
 from datetime import datetime
 from app.models.user import UserRole
 
 
+_DIGIT = re.compile(r"\d")
+
+
+def _check_password_strength(v: str) -> str:
+    """Shared password rules, checked with C-level string scans (Unicode-aware, e.g. Cyrillic)."""
+    if len(v) < 8:
+        raise ValueError('Password must be at least 8 characters')
+    # Lowercasing only changes something if there is an uppercase letter, and vice versa
+    if v.lower() == v:
+        raise ValueError('Password must contain at least one uppercase letter')
+    if v.upper() == v:
+        raise ValueError('Password must contain at least one lowercase letter')
+    if not _DIGIT.search(v):
+        raise ValueError('Password must contain at least one digit')
+    return v
+
+
 # Base schemas
 class UserBase(BaseModel):
     email: EmailStr
@@ -19,15 +37,7 @@ class UserCreate(UserBase):
     @field_validator('password')
     @classmethod
     def validate_password(cls, v: str) -> str:
-        if len(v) < 8:
-            raise ValueError('Password must be at least 8 characters')
-        if not any(c.isupper() for c in v):
-            raise ValueError('Password must contain at least one uppercase letter')
-        if not any(c.islower() for c in v):
-            raise ValueError('Password must contain at least one lowercase letter')
-        if not any(c.isdigit() for c in v):
-            raise ValueError('Password must contain at least one digit')
-        return v
+        return _check_password_strength(v)
 
 
 class UserCreateAdmin(UserCreate):
@@ -47,15 +57,7 @@ class UserUpdate(BaseModel):
     def validate_password(cls, v: Optional[str]) -> Optional[str]:
         if v is None:
             return v
-        if len(v) < 8:
-            raise ValueError('Password must be at least 8 characters')
-        if not any(c.isupper() for c in v):
-            raise ValueError('Password must contain at least one uppercase letter')
-        if not any(c.islower() for c in v):
-            raise ValueError('Password must contain at least one lowercase letter')
-        if not any(c.isdigit() for c in v):
-            raise ValueError('Password must contain at least one digit')
-        return v
+        return _check_password_strength(v)
 
 
 class AdminUserUpdate(UserUpdate):
@@ -63,6 +65,15 @@ class AdminUserUpdate(UserUpdate):
     is_verified: Optional[bool] = None
 
 
+# Bulk admin schemas
+class UserIds(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+
+class BulkUserResult(BaseModel):
+    ids: List[int]  # Users actually affected
+
+
 # Response schemas
 class UserInDB(UserBase):
     id: int
@@ -72,8 +83,7 @@ class UserInDB(UserBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class UserResponse(UserInDB):